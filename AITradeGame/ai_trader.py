@@ -1,51 +1,14 @@
 import json
+import time
 from typing import Dict
-from openai import OpenAI, APIConnectionError, APIError
+from openai import APIConnectionError, APIError
+from llm_clients import default_registry
+from decision_parser import DECISION_SCHEMA, DecisionValidator, IncrementalDecisionParser
 
-class AITrader:
-    def __init__(self, api_key: str, api_url: str, model_name: str):
-        self.api_key = api_key
-        self.api_url = api_url
-        self.model_name = model_name
-    
-    def make_decision(self, market_state: Dict, portfolio: Dict, 
-                     account_info: Dict) -> Dict:
-        prompt = self._build_prompt(market_state, portfolio, account_info)
-        
-        response = self._call_llm(prompt)
-        
-        decisions = self._parse_response(response)
-        
-        return decisions
-    
-    def _build_prompt(self, market_state: Dict, portfolio: Dict, 
-                     account_info: Dict) -> str:
-        prompt = f"""You are a professional cryptocurrency trader. Analyze the market and make trading decisions.
+# 静态前缀: 每次调用、每个模型完全相同，放在消息最前面以命中提供商的前缀缓存
+# (动态行情放在其后的 user 消息中，任何改动都不要引入时间戳等可变内容)
+SYSTEM_PROMPT = """You are a professional cryptocurrency trader. Analyze the market data provided by the user and make trading decisions. Output JSON format only.
 
-MARKET DATA:
-"""
-        for coin, data in market_state.items():
-            prompt += f"{coin}: ${data['price']:.2f} ({data['change_24h']:+.2f}%)\n"
-            if 'indicators' in data and data['indicators']:
-                indicators = data['indicators']
-                prompt += f"  SMA7: ${indicators.get('sma_7', 0):.2f}, SMA14: ${indicators.get('sma_14', 0):.2f}, RSI: {indicators.get('rsi_14', 0):.1f}\n"
-        
-        prompt += f"""
-ACCOUNT STATUS:
-- Initial Capital: ${account_info['initial_capital']:.2f}
-- Total Value: ${portfolio['total_value']:.2f}
-- Cash: ${portfolio['cash']:.2f}
-- Total Return: {account_info['total_return']:.2f}%
-
-CURRENT POSITIONS:
-"""
-        if portfolio['positions']:
-            for pos in portfolio['positions']:
-                prompt += f"- {pos['coin']} {pos['side']}: {pos['quantity']:.4f} @ ${pos['avg_price']:.2f} ({pos['leverage']}x)\n"
-        else:
-            prompt += "None\n"
-        
-        prompt += """
 TRADING RULES:
 1. Signals: buy_to_enter (long), sell_to_enter (short), close_position, hold
 2. Risk Management:
@@ -75,49 +38,191 @@ OUTPUT FORMAT (JSON only):
   }
 }
 ```
-
-Analyze and output JSON only.
 """
-        
-        return prompt
+
+
+def extract_usage(usage) -> Dict:
+    """Token usage from a completion, including provider-side cached prompt tokens"""
+    if usage is None:
+        return {}
+    details = getattr(usage, 'prompt_tokens_details', None)
+    # OpenAI: prompt_tokens_details.cached_tokens; DeepSeek: prompt_cache_hit_tokens
+    cached = getattr(details, 'cached_tokens', None) if details is not None else None
+    if cached is None:
+        cached = getattr(usage, 'prompt_cache_hit_tokens', None)
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+        'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+        'cached_tokens': cached or 0
+    }
+
+# 输出模式: text (提示词约束), json_object (JSON mode), json_schema (提供商按 DECISION_SCHEMA 约束)
+OUTPUT_MODES = ('text', 'json_object', 'json_schema')
+
+class AITrader:
+    # 拒绝 stream_options 的提供商 (provider_id 或 api_url)，所有 AITrader 共享，之后的流式请求不再请求用量
+    stream_usage_unsupported = set()
+
+    def __init__(self, api_key: str, api_url: str, model_name: str, provider_id: int = None,
+                 client_registry=None, stream: bool = False, output_mode: str = 'text',
+                 max_repairs: int = 1):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.model_name = model_name
+        self.provider_id = provider_id
+        # 同一提供商的所有模型共享一个带连接池的客户端
+        self.client_registry = client_registry or default_registry
+        # 流式模式: 边生成边解析，每个币种的决策对象闭合即回调，JSON 完整后立即中止生成
+        self.stream = stream
+        # JSON 完整后为读取末尾用量分块 (含缓存命中数) 最多继续读取的秒数；0 表示立即中止，不记录用量
+        self.usage_grace = 2.0
+        # 结构化输出: 提供商不支持 response_format 时自动退回 text 模式
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"output_mode must be one of {', '.join(OUTPUT_MODES)}")
+        self.output_mode = output_mode
+        # 校验失败的币种单独发回模型修正的次数 (只重试无效币种，不重跑整个决策)
+        self.max_repairs = max_repairs
+        self.validator = DecisionValidator()
+        # 最近一次决策 (含修正请求) 及累计的 token 用量 (cached_tokens 为前缀缓存命中数)
+        self.last_usage = {}
+        self.usage_totals = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
     
-    def _call_llm(self, prompt: str) -> str:
-        try:
-            base_url = self.api_url.rstrip('/')
-            if not base_url.endswith('/v1'):
-                if '/v1' in base_url:
-                    base_url = base_url.split('/v1')[0] + '/v1'
-                else:
-                    base_url = base_url + '/v1'
-            
-            client = OpenAI(
-                api_key=self.api_key,
-                base_url=base_url
-            )
-            
-            response = client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a professional cryptocurrency trader. Output JSON format only."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.7,
-                max_tokens=2000
-            )
+    def make_decision(self, market_state: Dict, portfolio: Dict, 
+                     account_info: Dict, timeout: float = None, on_decision=None) -> Dict:
+        """
+        Args:
+            timeout: LLM 请求超时 (秒)
+            on_decision: 流式模式下每个币种决策解析完成时调用 on_decision(coin, decision)
+        """
+        self.last_usage = {}
+        prompt = self._build_prompt(market_state, portfolio, account_info)
+        messages = [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        
+        repairing = set()
+        
+        def on_parsed(coin, decision):
+            # 流式模式下只把通过校验的决策交给调用方立即执行 (修正轮次只接受待修正的币种)
+            if on_decision is None or (repairing and coin not in repairing):
+                return
+            normalized, errors = self.validator.validate(decision)
+            if not errors:
+                on_decision(coin, normalized)
+        
+        response = self._call_llm(messages, timeout, on_parsed)
+        
+        decisions, invalid = self.validator.validate_all(self._parse_response(response))
+        parse_failed = not decisions and not invalid
+        
+        for _ in range(self.max_repairs):
+            if not invalid and not parse_failed:
+                break
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                break
             
-            return response.choices[0].message.content
+            if parse_failed:
+                print(f"[WARN] {self.model_name}: unparseable response, retrying")
+                repair = "Your previous response was not valid JSON. Output the JSON decision object only."
+            else:
+                print(f"[WARN] {self.model_name}: invalid decisions for {', '.join(invalid)}, requesting repair")
+                problems = '\n'.join(f"- {coin}: {'; '.join(errors)}" for coin, errors in invalid.items())
+                repair = ("These decisions were invalid:\n" + problems +
+                          "\nOutput corrected JSON for these coins only, in the same format.")
+                repairing = set(invalid)
+            messages = messages + [
+                {"role": "assistant", "content": response},
+                {"role": "user", "content": repair}
+            ]
+            response = self._call_llm(messages, remaining, on_parsed)
             
+            fixed, still_invalid = self.validator.validate_all(self._parse_response(response))
+            if not parse_failed:
+                # 只采纳需要修正的币种，其余币种保持首次结果
+                fixed = {coin: decision for coin, decision in fixed.items() if coin in invalid}
+                still_invalid = {coin: errors for coin, errors in still_invalid.items() if coin in invalid}
+                still_invalid.update({coin: errors for coin, errors in invalid.items()
+                                      if coin not in fixed and coin not in still_invalid})
+            decisions.update(fixed)
+            invalid = still_invalid
+            parse_failed = parse_failed and not fixed and not still_invalid
+        
+        if invalid:
+            print(f"[WARN] {self.model_name}: dropping invalid decisions for {', '.join(invalid)}")
+        
+        return decisions
+    
+    def _build_prompt(self, market_state: Dict, portfolio: Dict, 
+                     account_info: Dict) -> str:
+        """Dynamic part of the prompt (market, account, positions); the static rules live in SYSTEM_PROMPT"""
+        # 按行收集后一次性拼接，币种数量增加时保持线性开销
+        lines = ["MARKET DATA:"]
+        for coin, data in market_state.items():
+            lines.append(f"{coin}: ${data['price']:.2f} ({data['change_24h']:+.2f}%)")
+            if 'indicators' in data and data['indicators']:
+                indicators = data['indicators']
+                lines.append(f"  SMA7: ${indicators.get('sma_7', 0):.2f}, SMA14: ${indicators.get('sma_14', 0):.2f}, RSI: {indicators.get('rsi_14', 0):.1f}")
+                if 'macd' in indicators:
+                    lines.append(f"  MACD: {indicators['macd']:.4f} (signal {indicators.get('macd_signal', 0):.4f}), "
+                                 f"BB: ${indicators.get('bb_lower', 0):.2f}-${indicators.get('bb_upper', 0):.2f}, "
+                                 f"ATR14: ${indicators.get('atr_14', 0):.2f}, Vol: {indicators.get('volatility', 0) * 100:.1f}%")
+        
+        lines += [
+            "",
+            "ACCOUNT STATUS:",
+            f"- Initial Capital: ${account_info['initial_capital']:.2f}",
+            f"- Total Value: ${portfolio['total_value']:.2f}",
+            f"- Cash: ${portfolio['cash']:.2f}",
+            f"- Total Return: {account_info['total_return']:.2f}%",
+            "",
+            "CURRENT POSITIONS:"
+        ]
+        if portfolio['positions']:
+            for pos in portfolio['positions']:
+                lines.append(f"- {pos['coin']} {pos['side']}: {pos['quantity']:.4f} @ ${pos['avg_price']:.2f} ({pos['leverage']}x)")
+        else:
+            lines.append("None")
+        lines += ["", "Analyze and output JSON only."]
+        return '\n'.join(lines)
+    
+    def _response_format(self):
+        if self.output_mode == 'json_object':
+            return {'type': 'json_object'}
+        if self.output_mode == 'json_schema':
+            return {'type': 'json_schema',
+                    'json_schema': {'name': 'trading_decisions', 'schema': DECISION_SCHEMA}}
+        return None
+    
+    def _call_llm(self, messages: list, timeout: float = None, on_decision=None) -> str:
+        try:
+            # 租用共享客户端直到响应读完，期间提供商配置变化也不会关闭它
+            with self.client_registry.lease(self.api_url, self.api_key, self.provider_id) as client:
+                return self._request(client, messages, timeout, on_decision)
         except APIConnectionError as e:
             error_msg = f"API connection failed: {str(e)}"
             print(f"[ERROR] {error_msg}")
             raise Exception(error_msg)
         except APIError as e:
+            if self.stream and self._is_rejected_param(e, ('stream_options', 'include_usage')) \
+                    and self._provider_key() not in self.stream_usage_unsupported:
+                # 提供商不支持 stream_options: 记住后不带该参数重试，流式响应不再记录用量
+                print(f"[WARN] {self.model_name}: stream_options rejected, streaming without usage")
+                self.stream_usage_unsupported.add(self._provider_key())
+                return self._call_llm(messages, timeout, on_decision)
+            if self.output_mode != 'text' and self._is_response_format_error(e):
+                # 提供商不支持 response_format，退回提示词约束的 text 模式后重试
+                print(f"[WARN] {self.model_name}: {self.output_mode} output rejected, falling back to text mode")
+                self.output_mode = 'text'
+                return self._call_llm(messages, timeout, on_decision)
             error_msg = f"API error ({e.status_code}): {e.message}"
             print(f"[ERROR] {error_msg}")
             raise Exception(error_msg)
@@ -128,6 +233,108 @@ Analyze and output JSON only.
             print(traceback.format_exc())
             raise Exception(error_msg)
     
+    def _request(self, client, messages: list, timeout: float = None, on_decision=None) -> str:
+        # 周期截止时间剩余的秒数，未指定时使用客户端默认超时
+        options = {'timeout': timeout} if timeout is not None else {}
+        if timeout is not None:
+            # 客户端默认重试 2 次，每次都可用满超时，会越过截止时间；有截止时间时不重试
+            client = client.with_options(max_retries=0)
+        response_format = self._response_format()
+        if response_format is not None:
+            options['response_format'] = response_format
+        
+        if self.stream and self._provider_key() not in self.stream_usage_unsupported:
+            # 流式响应的用量只在最后一个分块中返回
+            options['stream_options'] = {'include_usage': True}
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        
+        response = client.chat.completions.create(
+            model=self.model_name,
+            messages=messages,
+            temperature=0.7,
+            max_tokens=2000,
+            stream=self.stream,
+            **options
+        )
+        
+        if self.stream:
+            usage_grace = self.usage_grace if 'stream_options' in options else 0
+            return self._consume_stream(response, on_decision, deadline, usage_grace)
+        
+        self._record_usage(getattr(response, 'usage', None))
+        return response.choices[0].message.content
+    
+    def _provider_key(self):
+        return self.provider_id if self.provider_id is not None else self.api_url
+    
+    @staticmethod
+    def _is_rejected_param(error, terms) -> bool:
+        """Only a 400 that names one of the given request parameters (not context length, model name, ...)"""
+        if getattr(error, 'status_code', None) != 400:
+            return False
+        text = f"{getattr(error, 'message', '')} {getattr(error, 'body', '')} {error}".lower()
+        return any(term in text for term in terms)
+    
+    @staticmethod
+    def _is_response_format_error(error) -> bool:
+        """A 400 that names the structured-output parameter"""
+        return AITrader._is_rejected_param(error, ('response_format', 'json_schema', 'json_object', 'json mode'))
+    
+    def _consume_stream(self, stream, on_decision=None, deadline: float = None, usage_grace: float = 0) -> str:
+        """
+        Read a streamed completion, dispatching each coin as it closes
+
+        timeout on the request bounds each read, not the whole response, so
+        the deadline is checked per chunk. Once the JSON is complete only
+        the trailing usage chunk is waited for, at most usage_grace seconds
+        (0 when usage was not requested).
+        """
+        parser = IncrementalDecisionParser()
+        usage = None
+        drain_until = None
+        try:
+            for chunk in stream:
+                if getattr(chunk, 'usage', None) is not None:
+                    usage = chunk.usage  # 部分提供商每个分块都带累计用量，取最后一个
+                now = time.monotonic()
+                if drain_until is not None:
+                    if usage is not None or now >= drain_until:
+                        break
+                    continue
+                if deadline is not None and now >= deadline:
+                    print(f"[WARN] {self.model_name}: stream passed the cycle deadline, aborting")
+                    break
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if not text:
+                    continue
+                for coin, decision in parser.feed(text):
+                    if on_decision is not None:
+                        on_decision(coin, decision)
+                if parser.complete:
+                    if usage is not None or usage_grace <= 0:
+                        break
+                    # JSON 已完整，剩余文本不再处理，只在宽限期内等待用量分块
+                    drain_until = now + usage_grace
+                    if deadline is not None:
+                        drain_until = min(drain_until, deadline)
+        finally:
+            # 提前中止时关闭响应，服务端随之停止生成
+            stream.close()
+        self._record_usage(usage)
+        return parser.json_text() if parser.complete else parser.buffer
+    
+    def _record_usage(self, usage):
+        # last_usage 累加一次决策内的所有请求 (含修正轮次)，在 make_decision 开始时清零
+        usage = extract_usage(usage)
+        if not usage:
+            return
+        self.usage_totals['calls'] += 1
+        for key, value in usage.items():
+            self.last_usage[key] = self.last_usage.get(key, 0) + value
+            self.usage_totals[key] += value
+    
     def _parse_response(self, response: str) -> Dict:
         response = response.strip()
         
@@ -138,6 +345,9 @@ Analyze and output JSON only.
         
         try:
             decisions = json.loads(response.strip())
+            if not isinstance(decisions, dict):
+                print(f"[ERROR] Expected a JSON object, got {type(decisions).__name__}")
+                return {}
             return decisions
         except json.JSONDecodeError as e:
             print(f"[ERROR] JSON parse failed: {e}")
@@ -7,7 +7,12 @@ import re
 from datetime import datetime
 from trading_engine import TradingEngine
 from market_data import MarketDataFetcher
+from market_snapshot import MarketSnapshotService
+from symbol_registry import SymbolRegistry
+from tick_store import TickWriter
+from cycle_executor import CycleExecutor
 from ai_trader import AITrader
+from llm_clients import default_registry as llm_clients
 from database import Database
 from version import __version__, __github_owner__, __repo__, GITHUB_REPO_URL, LATEST_RELEASE_URL
 
@@ -15,17 +20,34 @@ app = Flask(__name__)
 CORS(app)
 
 db = Database('AITradeGame.db')
+symbol_registry = SymbolRegistry(db)
+# 抓取到的价格后台批量写入 market_ticks，并汇总为 1m/5m/1h 本地K线
+tick_writer = TickWriter(db)
+
+def parse_source_priority(data_source_priority: str) -> list:
+    return [s.strip() for s in data_source_priority.split(',') if s.strip()]
 
 # Initialize market fetcher with data source priority from settings
 def get_market_fetcher():
     """Get market fetcher with current settings"""
     settings = db.get_settings()
     data_source_priority = settings.get('data_source_priority', 'odaily,528btc,binance,coingecko')
-    priority_list = [s.strip() for s in data_source_priority.split(',')]
-    return MarketDataFetcher(data_source_priority=priority_list)
+    priority_list = parse_source_priority(data_source_priority)
+    # 对冲模式：当前数据源2秒未返回即并发启动下一个，最先返回的完整结果胜出
+    # 缓存过期后10分钟内先返回旧价格，后台刷新，避免仪表盘请求阻塞
+    return MarketDataFetcher(data_source_priority=priority_list, fetch_mode='hedged', hedge_delay=2.0,
+                             candle_store=db, stale_while_revalidate=600, symbol_registry=symbol_registry,
+                             tick_writer=tick_writer)
 
 market_fetcher = get_market_fetcher()
+MARKET_CACHE_PATH = 'market_cache.json.gz'  # 行情缓存快照，重启后热启动
+snapshot_service = MarketSnapshotService(market_fetcher, symbol_registry=symbol_registry)
 trading_engines = {}
+# 所有模型并发决策: 全局最多8个，同一提供商最多2个，单个模型超过150秒即取消
+cycle_executor = CycleExecutor(max_workers=8, per_provider_limit=2, model_deadline=150)
+CYCLE_INTERVAL = 180  # 周期间隔 (秒)，从周期开始计时
+LLM_STREAMING = True  # 流式接收决策，币种决策到达即执行
+LLM_OUTPUT_MODE = 'json_object'  # 结构化输出 (JSON mode)，提供商不支持时自动退回 text
 auto_trading = True
 TRADE_FEE_RATE = 0.001  # 默认交易费率
 
@@ -74,6 +96,11 @@ def delete_provider(provider_id):
                 return jsonify({'error': '密码错误'}), 403
 
         db.delete_provider(provider_id)
+        # 与重启后一致: 提供商不存在的模型不再运行，否则其 AITrader 会为已删除的配置重建客户端
+        for model_id in [m for m, engine in trading_engines.items() if engine.ai_trader.provider_id == provider_id]:
+            del trading_engines[model_id]
+            print(f"[INFO] Model {model_id} stopped: provider {provider_id} deleted")
+        llm_clients.evict_provider(provider_id)
         return jsonify({'message': 'Provider deleted successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -145,38 +172,27 @@ def test_api_connection():
         api_key = provider['api_key']
 
         # Test API connection by making a simple request
-        from openai import OpenAI, APIConnectionError, APIError
+        from openai import APIConnectionError, APIError
 
         try:
-            # Use the same base_url handling logic as ai_trader.py
-            base_url = api_url.rstrip('/')
-            if not base_url.endswith('/v1'):
-                if '/v1' in base_url:
-                    base_url = base_url.split('/v1')[0] + '/v1'
-                else:
-                    base_url = base_url + '/v1'
-
-            client = OpenAI(
-                api_key=api_key,
-                base_url=base_url
-            )
-
-            # Simple test message to verify the API works
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant."
-                    },
-                    {
-                        "role": "user",
-                        "content": "Hello, this is a connection test. Please respond with 'Test successful'."
-                    }
-                ],
-                max_tokens=50,
-                temperature=0.1
-            )
+            # 与交易使用同一个共享客户端，测试通过即说明连接池可用
+            with llm_clients.lease(api_url, api_key, provider_id) as client:
+                # Simple test message to verify the API works
+                response = client.chat.completions.create(
+                    model=model_name,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a helpful assistant."
+                        },
+                        {
+                            "role": "user",
+                            "content": "Hello, this is a connection test. Please respond with 'Test successful'."
+                        }
+                    ],
+                    max_tokens=50,
+                    temperature=0.1
+                )
 
             # Extract the response content
             test_response = response.choices[0].message.content.strip()
@@ -248,9 +264,13 @@ def add_model():
             ai_trader=AITrader(
                 api_key=model['api_key'],
                 api_url=model['api_url'],
-                model_name=model['model_name']
+                model_name=model['model_name'],
+                provider_id=model['provider_id'],
+                stream=LLM_STREAMING,
+                output_mode=LLM_OUTPUT_MODE
             ),
-            trade_fee_rate=TRADE_FEE_RATE  # 新增：传入费率
+            trade_fee_rate=TRADE_FEE_RATE,  # 新增：传入费率
+            symbol_registry=symbol_registry
         )
         print(f"[INFO] Model {model_id} ({data['name']}) initialized")
 
@@ -286,8 +306,7 @@ def delete_model(model_id):
 @app.route('/api/models/<int:model_id>/portfolio', methods=['GET'])
 def get_portfolio(model_id):
     time_range = request.args.get('time_range', None)
-    prices_data = market_fetcher.get_current_prices(['BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'DOGE'])
-    current_prices = {coin: prices_data[coin]['price'] for coin in prices_data}
+    current_prices = market_fetcher.get_valuation_prices(symbol_registry.coins())
 
     portfolio = db.get_portfolio(model_id, current_prices)
     account_value = db.get_account_value_history(model_id, limit=100, time_range=time_range)
@@ -313,8 +332,7 @@ def get_conversations(model_id):
 def get_aggregated_portfolio():
     """Get aggregated portfolio data across all models"""
     time_range = request.args.get('time_range', None)
-    prices_data = market_fetcher.get_current_prices(['BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'DOGE'])
-    current_prices = {coin: prices_data[coin]['price'] for coin in prices_data}
+    current_prices = market_fetcher.get_valuation_prices(symbol_registry.coins())
 
     # Get aggregated data
     models = db.get_all_models()
@@ -388,10 +406,88 @@ def get_models_chart_data():
 
 @app.route('/api/market/prices', methods=['GET'])
 def get_market_prices():
-    coins = ['BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'DOGE']
+    coins = symbol_registry.coins()
     prices = market_fetcher.get_current_prices(coins)
     return jsonify(prices)
 
+@app.route('/api/market/data', methods=['GET'])
+def get_market_overview():
+    """Market cap, volume and 24h high/low for all coins in one upstream request"""
+    coins = symbol_registry.coins()
+    return jsonify(market_fetcher.get_market_data_bulk(coins))
+
+# ============ Symbol Registry Endpoints ============
+
+@app.route('/api/symbols', methods=['GET'])
+def get_symbols():
+    """Get all registered coins and their per-source symbols"""
+    return jsonify(db.get_symbols())
+
+@app.route('/api/symbols', methods=['POST'])
+def add_symbol():
+    """Add a coin (or update its Binance symbol / CoinGecko id)"""
+    data = request.json
+    try:
+        # Verify password if password protection is enabled
+        if db.has_operation_password():
+            password = data.get('password', '')
+            if not db.verify_operation_password(password):
+                return jsonify({'error': '密码错误'}), 403
+
+        symbol_registry.add(
+            data['symbol'],
+            binance_symbol=data.get('binance_symbol'),
+            coingecko_id=data.get('coingecko_id'),
+            enabled=bool(data.get('enabled', True))
+        )
+        return jsonify({'message': 'Symbol saved successfully', 'count': len(symbol_registry)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/symbols/<symbol>', methods=['PUT'])
+def update_symbol(symbol):
+    """Enable or disable a coin"""
+    data = request.json or {}
+    try:
+        if db.has_operation_password():
+            password = data.get('password', '')
+            if not db.verify_operation_password(password):
+                return jsonify({'error': '密码错误'}), 403
+
+        symbol_registry.set_enabled(symbol, bool(data.get('enabled', True)))
+        return jsonify({'message': 'Symbol updated successfully', 'count': len(symbol_registry)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/symbols/<symbol>', methods=['DELETE'])
+def delete_symbol(symbol):
+    """Remove a coin from the registry"""
+    try:
+        if db.has_operation_password():
+            data = request.json or {}
+            password = data.get('password', '')
+            if not db.verify_operation_password(password):
+                return jsonify({'error': '密码错误'}), 403
+
+        symbol_registry.remove(symbol)
+        return jsonify({'message': 'Symbol deleted successfully', 'count': len(symbol_registry)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/market/history/<coin>', methods=['GET'])
+def get_market_history(coin):
+    """Local OHLC bars for charts (interval: 1m, 5m, 1h or 1h_tick)"""
+    interval = request.args.get('interval', '1h')
+    if interval not in ('1m', '5m', '1h', '1h_tick'):
+        return jsonify({'error': 'Unsupported interval'}), 400
+    limit = request.args.get('limit', 200, type=int)
+    return jsonify(market_fetcher.get_local_history(coin.upper(), interval=interval, limit=limit))
+
+@app.route('/api/market/health', methods=['GET'])
+def get_market_health():
+    """Get data source health stats and the effective source order"""
+    return jsonify(market_fetcher.get_source_health())
+
 @app.route('/api/models/<int:model_id>/execute', methods=['POST'])
 def execute_trading(model_id):
     if model_id not in trading_engines:
@@ -411,9 +507,13 @@ def execute_trading(model_id):
             ai_trader=AITrader(
                 api_key=provider['api_key'],
                 api_url=provider['api_url'],
-                model_name=model['model_name']
+                model_name=model['model_name'],
+                provider_id=model['provider_id'],
+                stream=LLM_STREAMING,
+                output_mode=LLM_OUTPUT_MODE
             ),
-            trade_fee_rate=TRADE_FEE_RATE  # 新增：传入费率
+            trade_fee_rate=TRADE_FEE_RATE,  # 新增：传入费率
+            symbol_registry=symbol_registry
         )
     
     try:
@@ -435,36 +535,49 @@ def trading_loop():
             print(f"[CYCLE] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
             print(f"[INFO] Active models: {len(trading_engines)}")
             print(f"{'='*60}")
-            
-            for model_id, engine in list(trading_engines.items()):
-                try:
-                    print(f"\n[EXEC] Model {model_id}")
-                    result = engine.execute_trading_cycle()
-                    
-                    if result.get('success'):
-                        print(f"[OK] Model {model_id} completed")
-                        if result.get('executions'):
-                            for exec_result in result['executions']:
-                                signal = exec_result.get('signal', 'unknown')
-                                coin = exec_result.get('coin', 'unknown')
-                                msg = exec_result.get('message', '')
-                                if signal != 'hold':
-                                    print(f"  [TRADE] {coin}: {msg}")
-                    else:
-                        error = result.get('error', 'Unknown error')
-                        print(f"[WARN] Model {model_id} failed: {error}")
-                        
-                except Exception as e:
-                    print(f"[ERROR] Model {model_id} exception: {e}")
-                    import traceback
-                    print(traceback.format_exc())
-                    continue
-            
+
+            cycle_start = time.time()
+            # 每个周期只获取一次行情和指标，所有模型共享同一个快照
+            snapshot = snapshot_service.build_snapshot()
+            print(f"[EXEC] {len(trading_engines)} model(s) in parallel (snapshot v{snapshot.version})")
+
+            results = cycle_executor.run_cycle(dict(trading_engines), snapshot)
+
+            cycle_tokens = {'prompt_tokens': 0, 'cached_tokens': 0, 'completion_tokens': 0}
+            for model_id, result in results.items():
+                if result.get('success'):
+                    usage = result.get('usage') or {}
+                    for key in cycle_tokens:
+                        cycle_tokens[key] += usage.get(key, 0)
+                    print(f"[OK] Model {model_id} completed "
+                          f"(prompt {usage.get('prompt_tokens', 0)}, cached {usage.get('cached_tokens', 0)} tokens)")
+                    if result.get('executions'):
+                        for exec_result in result['executions']:
+                            signal = exec_result.get('signal', 'unknown')
+                            coin = exec_result.get('coin', 'unknown')
+                            msg = exec_result.get('message', '')
+                            if signal != 'hold':
+                                print(f"  [TRADE] {coin}: {msg}")
+                elif result.get('cancelled'):
+                    print(f"[WARN] Model {model_id} cancelled: {result.get('error', 'cancelled')}")
+                    for exec_result in result.get('executions') or []:
+                        if exec_result.get('signal', 'unknown') != 'hold':
+                            print(f"  [TRADE] {exec_result.get('coin', 'unknown')}: {exec_result.get('message', '')} (before cancel)")
+                else:
+                    error = result.get('error', 'Unknown error')
+                    print(f"[WARN] Model {model_id} failed: {error}")
+
+            print(f"[INFO] Cycle tokens: prompt {cycle_tokens['prompt_tokens']} "
+                  f"(cached {cycle_tokens['cached_tokens']}), completion {cycle_tokens['completion_tokens']}")
+
+            # 下个周期按固定节奏开始，执行耗时不再累加到间隔上
+            elapsed = time.time() - cycle_start
+            wait_seconds = max(0.0, CYCLE_INTERVAL - elapsed)
             print(f"\n{'='*60}")
-            print(f"[SLEEP] Waiting 3 minutes for next cycle")
+            print(f"[SLEEP] Cycle took {elapsed:.1f}s, next cycle in {wait_seconds:.0f}s")
             print(f"{'='*60}\n")
             
-            time.sleep(180)
+            time.sleep(wait_seconds)
             
         except Exception as e:
             print(f"\n[CRITICAL] Trading loop error: {e}")
@@ -480,8 +593,7 @@ def get_leaderboard():
     models = db.get_all_models()
     leaderboard = []
     
-    prices_data = market_fetcher.get_current_prices(['BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'DOGE'])
-    current_prices = {coin: prices_data[coin]['price'] for coin in prices_data}
+    current_prices = market_fetcher.get_valuation_prices(symbol_registry.coins())
     
     for model in models:
         portfolio = db.get_portfolio(model['id'], current_prices)
@@ -515,7 +627,6 @@ def get_settings():
 @app.route('/api/settings', methods=['PUT'])
 def update_settings():
     """Update system settings"""
-    global market_fetcher
     try:
         data = request.json
 
@@ -529,15 +640,26 @@ def update_settings():
         trading_fee_rate = float(data.get('trading_fee_rate', 0.001))
         data_source_priority = data.get('data_source_priority', 'odaily,528btc,binance,coingecko')
 
-        success = db.update_settings(trading_frequency_minutes, trading_fee_rate, data_source_priority)
+        # 先校验，无效配置直接拒绝
+        source_settings = {'data_source_priority': parse_source_priority(data_source_priority)}
+        try:
+            market_fetcher.validate_settings(**source_settings)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
-        if success:
-            # Reinitialize market fetcher with new settings
-            market_fetcher = get_market_fetcher()
-            print(f"[INFO] Settings updated, data source priority: {data_source_priority}")
-            return jsonify({'success': True, 'message': 'Settings updated successfully'})
-        else:
+        # 先保存再应用: 保存失败时运行中的数据源配置保持不变
+        if not db.update_settings(trading_frequency_minutes, trading_fee_rate, data_source_priority):
             return jsonify({'success': False, 'error': 'Failed to update settings'}), 500
+
+        # 原地更新数据源配置: 保留缓存、连接池和健康统计，所有引擎共享同一个实例立即生效
+        try:
+            market_fetcher.reconfigure(**source_settings)
+        except Exception as e:
+            print(f"[ERROR] Settings saved but data source reconfigure failed: {e}")
+            return jsonify({'success': False, 'error': f'Settings saved but not applied: {e}'}), 500
+
+        print(f"[INFO] Settings updated, data source priority: {data_source_priority}")
+        return jsonify({'success': True, 'message': 'Settings updated successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -707,9 +829,13 @@ def init_trading_engines():
                     ai_trader=AITrader(
                         api_key=provider['api_key'],
                         api_url=provider['api_url'],
-                        model_name=model['model_name']
+                        model_name=model['model_name'],
+                        provider_id=model['provider_id'],
+                        stream=LLM_STREAMING,
+                        output_mode=LLM_OUTPUT_MODE
                     ),
-                    trade_fee_rate=TRADE_FEE_RATE
+                    trade_fee_rate=TRADE_FEE_RATE,
+                    symbol_registry=symbol_registry
                 )
                 print(f"  [OK] Model {model_id} ({model_name})")
             except Exception as e:
@@ -724,6 +850,7 @@ def init_trading_engines():
 if __name__ == '__main__':
     import webbrowser
     import os
+    import atexit
     
     print("\n" + "=" * 60)
     print("AITradeGame - Starting...")
@@ -731,8 +858,16 @@ if __name__ == '__main__':
     print("[INFO] Initializing database...")
     
     db.init_db()
+    symbol_registry.reload()
+    tick_writer.start()
+    atexit.register(tick_writer.stop)
+    market_fetcher.load_state(MARKET_CACHE_PATH)
+    market_fetcher.start_state_persistence(MARKET_CACHE_PATH)
+    atexit.register(lambda: market_fetcher.save_state(MARKET_CACHE_PATH))
+    atexit.register(llm_clients.close)
+    atexit.register(cycle_executor.shutdown)
     
-    print("[INFO] Database initialized")
+    print(f"[INFO] Database initialized ({len(symbol_registry)} coins enabled)")
     print("[INFO] Initializing trading engines...")
     
     init_trading_engines()
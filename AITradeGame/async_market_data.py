@@ -0,0 +1,304 @@
+"""
+Async market data module - asyncio-native fetcher with a synchronous facade
+
+One aiohttp session (pooled connections) and a semaphore bound the number
+of requests in flight, so hundreds of price and history requests run on a
+single event loop thread instead of one thread each.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+from indicators import IndicatorEngine
+from market_sources import (BINANCE_BASE_URL, BROWSER_HEADERS, BTC528_URL, COINGECKO_BASE_URL,
+                            binance_ticker_requests, coingecko_price_requests, parse_528btc_prices,
+                            parse_binance_tickers, parse_coingecko_history, parse_coingecko_prices)
+from odaily_fetcher import ODAILY_HEADERS, ODAILY_URL, build_market_index, parse_market_data, prices_from_index
+from request_scheduler import TokenBucket
+from symbol_registry import SymbolRegistry
+
+
+class AsyncMarketDataFetcher:
+    """
+    Fetch prices, history and indicators with asyncio
+
+    Covers MarketDataFetcher's price/history/indicator methods as
+    coroutines, with the same per-coin cache semantics (LRU bound,
+    stale-while-revalidate). Request building and response parsing come
+    from market_sources / odaily_fetcher, shared with MarketDataFetcher.
+    """
+
+    def __init__(self, data_source_priority=None, max_concurrency: int = 32, per_host_limit: int = 8,
+                 symbol_registry=None, rate_limits: Dict = None, stale_while_revalidate: float = 0,
+                 cache_max_coins: int = 512):
+        """
+        Args:
+            data_source_priority: 数据源优先级列表，例如 ['odaily', '528btc', 'binance', 'coingecko']
+            max_concurrency: 同时进行的请求上限 (所有主机合计)
+            per_host_limit: 每个主机的最大连接数
+            symbol_registry: 币种注册表，为空时使用默认6个币种
+            rate_limits: 按主机限速 {host: (每秒请求数, 突发容量)}，默认只限制 CoinGecko 免费接口
+            stale_while_revalidate: 缓存过期后仍可直接返回旧数据的秒数，同时后台刷新 (0 = 关闭)
+            cache_max_coins: 价格缓存最多保留的币种数，超出后按 LRU 淘汰
+        """
+        if not HAS_AIOHTTP:
+            raise RuntimeError("aiohttp is required for the async fetcher (pip install aiohttp)")
+
+        self.data_source_priority = data_source_priority or ['odaily', '528btc', 'binance', 'coingecko']
+        self.symbol_registry = symbol_registry if symbol_registry is not None else SymbolRegistry()
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+
+        self.source_timeouts = {
+            'odaily': 15,
+            '528btc': 10,
+            'binance': 5,
+            'coingecko': 10
+        }
+        self.odaily_url = ODAILY_URL
+        self.btc528_base_url = BTC528_URL
+        self.binance_base_url = BINANCE_BASE_URL
+        self.coingecko_base_url = COINGECKO_BASE_URL
+
+        if rate_limits is None:
+            rate_limits = {'api.coingecko.com': (0.5, 5)}
+        self._buckets = {host: TokenBucket(rate, burst) for host, (rate, burst) in rate_limits.items()}
+
+        # 会话和信号量绑定事件循环，首次请求时在循环内创建
+        self._session = None
+        self._semaphore = None
+
+        self._price_cache = OrderedDict()  # coin -> (price_data, fetched_at)，LRU 淘汰
+        self._cache_duration = 180
+        self._cache_max_coins = cache_max_coins
+        self.stale_while_revalidate = stale_while_revalidate
+        self._inflight = {}  # 相同币种集合的并发请求共享一个 Task
+        self.indicator_engine = IndicatorEngine()
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host_limit)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def _request(self, url: str, params: Dict = None, headers: Dict = None,
+                       timeout: float = 10, as_json: bool = True):
+        session = await self._get_session()
+        bucket = self._buckets.get(urlsplit(url).hostname)
+        if bucket is not None:
+            delay = bucket.reserve()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        async with self._semaphore:
+            async with session.get(url, params=params, headers=headers,
+                                   timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                if response.status == 429 and bucket is not None:
+                    bucket.penalize(float(response.headers.get('Retry-After', 30)))
+                response.raise_for_status()
+                if as_json:
+                    return await response.json(content_type=None)
+                return await response.text()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # ---- 数据源 ----
+
+    async def _get_prices_from_odaily(self, coins: List[str]) -> Dict[str, Dict]:
+        html = await self._request(self.odaily_url, headers=ODAILY_HEADERS,
+                                   timeout=self.source_timeouts['odaily'], as_json=False)
+        return prices_from_index(build_market_index(parse_market_data(html)), coins)
+
+    async def _get_prices_from_528btc(self, coins: List[str]) -> Dict[str, Dict]:
+        html = await self._request(self.btc528_base_url, headers=BROWSER_HEADERS,
+                                   timeout=self.source_timeouts['528btc'], as_json=False)
+        return parse_528btc_prices(html, coins)
+
+    async def _get_prices_from_binance(self, coins: List[str]) -> Dict[str, Dict]:
+        coin_by_symbol, batches = binance_ticker_requests(coins, self.symbol_registry.binance_symbols)
+        # 分批并发请求
+        responses = await asyncio.gather(*[
+            self._request(f"{self.binance_base_url}/ticker/24hr", params=params,
+                          timeout=self.source_timeouts['binance'])
+            for params in batches
+        ])
+        prices = {}
+        for data in responses:
+            prices.update(parse_binance_tickers(data, coin_by_symbol))
+        return prices
+
+    async def _get_prices_from_coingecko(self, coins: List[str]) -> Dict[str, Dict]:
+        coin_by_id, batches = coingecko_price_requests(coins, self.symbol_registry.coingecko_mapping)
+        responses = await asyncio.gather(*[
+            self._request(f"{self.coingecko_base_url}/simple/price", params=params,
+                          timeout=self.source_timeouts['coingecko'])
+            for params in batches
+        ])
+        prices = {}
+        for data in responses:
+            prices.update(parse_coingecko_prices(data, coin_by_id))
+        return prices
+
+    # ---- 公共接口 ----
+
+    async def get_current_prices(self, coins: List[str], allow_stale: bool = True) -> Dict[str, Dict]:
+        """
+        Prices by priority, fresh per-coin cache first
+
+        Args:
+            allow_stale: 过期不超过 stale_while_revalidate 的缓存直接返回并在后台刷新；
+                False 时等待新数据 (交易周期使用)
+        """
+        now = time.time()
+        result = {}
+        stale = []
+        missing = []
+        for coin in coins:
+            entry = self._price_cache.get(coin)
+            if entry is not None:
+                self._price_cache.move_to_end(coin)
+                age = now - entry[1]
+                if age < self._cache_duration:
+                    result[coin] = entry[0]
+                    continue
+                if allow_stale and age < self._cache_duration + self.stale_while_revalidate:
+                    result[coin] = entry[0]
+                    stale.append(coin)
+                    continue
+            missing.append(coin)
+
+        if stale:
+            self._refresh_prices(stale)  # 不等待
+
+        if missing:
+            fetched = await asyncio.shield(self._refresh_prices(missing))
+            result.update({coin: fetched[coin] for coin in missing if coin in fetched})
+
+        return {coin: result[coin] for coin in coins if coin in result}
+
+    def _refresh_prices(self, coins: List[str]) -> asyncio.Task:
+        """Start (or join) the fetch for this coin set; concurrent callers share one Task"""
+        key = tuple(sorted(set(coins)))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_prices(list(key)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._inflight.pop(k, None))
+        return task
+
+    async def _fetch_prices(self, coins: List[str]) -> Dict[str, Dict]:
+        sources = {
+            'odaily': self._get_prices_from_odaily,
+            '528btc': self._get_prices_from_528btc,
+            'binance': self._get_prices_from_binance,
+            'coingecko': self._get_prices_from_coingecko
+        }
+        for source in self.data_source_priority:
+            if source not in sources:
+                continue
+            try:
+                prices = await sources[source](coins)
+            except Exception as e:
+                print(f"[ERROR] {source} failed: {e}")
+                continue
+            if prices:
+                print(f"[INFO] Successfully fetched {len(prices)} prices from {source} (async)")
+                now = time.time()
+                for coin, data in prices.items():
+                    self._price_cache[coin] = (data, now)
+                    self._price_cache.move_to_end(coin)
+                while len(self._price_cache) > self._cache_max_coins:
+                    self._price_cache.popitem(last=False)
+                return prices
+        return {}
+
+    async def get_historical_prices(self, coin: str, days: int = 7) -> List[Dict]:
+        """Get historical prices from CoinGecko"""
+        coin_id = self.symbol_registry.coingecko_mapping.get(coin, coin.lower())
+        try:
+            data = await self._request(f"{self.coingecko_base_url}/coins/{coin_id}/market_chart",
+                                       params={'vs_currency': 'usd', 'days': days},
+                                       timeout=self.source_timeouts['coingecko'])
+        except Exception as e:
+            print(f"[ERROR] Failed to get historical prices for {coin}: {e}")
+            return []
+        return parse_coingecko_history(data)
+
+    async def get_historical_prices_many(self, coins: List[str], days: int = 7) -> Dict[str, List[Dict]]:
+        """Histories for many coins concurrently (bounded by max_concurrency and rate limits)"""
+        histories = await asyncio.gather(*[self.get_historical_prices(coin, days) for coin in coins])
+        return dict(zip(coins, histories))
+
+    async def calculate_technical_indicators(self, coin: str) -> Dict:
+        historical = await self.get_historical_prices(coin, days=14)
+        if historical:
+            self.indicator_engine.update_history(coin, historical)
+        return self.indicator_engine.snapshot(coin)
+
+    async def calculate_indicators_for_coins(self, coins: List[str]) -> Dict[str, Dict]:
+        histories = await self.get_historical_prices_many(coins, days=14)
+        results = {}
+        for coin in coins:
+            if histories.get(coin):
+                self.indicator_engine.update_history(coin, histories[coin])
+            results[coin] = self.indicator_engine.snapshot(coin)
+        return results
+
+
+class SyncMarketDataFetcher:
+    """
+    Blocking facade over AsyncMarketDataFetcher
+
+    Owns one event loop on a daemon thread; every call is scheduled onto it
+    with run_coroutine_threadsafe, so concurrent callers share the same
+    session, cache and concurrency limits.
+
+    Not a drop-in replacement for MarketDataFetcher: it only offers the
+    price, history and indicator methods below. app.py also relies on
+    get_market_data_bulk, get_valuation_prices, reconfigure/validate_settings,
+    get_source_health, the candle store (sync_candles, get_local_history),
+    the tick feed and state persistence, which only MarketDataFetcher has.
+    """
+
+    def __init__(self, **fetcher_options):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='market-async', daemon=True)
+        self._thread.start()
+        self.fetcher = AsyncMarketDataFetcher(**fetcher_options)
+
+    @property
+    def symbol_registry(self):
+        return self.fetcher.symbol_registry
+
+    def _run(self, coroutine, timeout: float = None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    def get_current_prices(self, coins: List[str], allow_stale: bool = True) -> Dict[str, Dict]:
+        return self._run(self.fetcher.get_current_prices(coins, allow_stale))
+
+    def get_historical_prices(self, coin: str, days: int = 7) -> List[Dict]:
+        return self._run(self.fetcher.get_historical_prices(coin, days))
+
+    def calculate_technical_indicators(self, coin: str) -> Dict:
+        return self._run(self.fetcher.calculate_technical_indicators(coin))
+
+    def calculate_indicators_for_coins(self, coins: List[str]) -> Dict[str, Dict]:
+        return self._run(self.fetcher.calculate_indicators_for_coins(coins))
+
+    def close(self):
+        self._run(self.fetcher.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
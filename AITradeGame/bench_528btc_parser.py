@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark 528btc ticker parsing: per-coin BeautifulSoup lookups vs single-pass parser
+
+The fixture (fixtures/528btc_home.html) is a trimmed reconstruction of the
+528btc homepage: the walking ticker markup plus news/flash lists for page bulk.
+"""
+import os
+import sys
+import time
+
+try:
+    from bs4 import BeautifulSoup
+    HAS_BS4 = True
+except ImportError:
+    HAS_BS4 = False
+
+from btc528_parser import parse_walking_items
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', '528btc_home.html')
+ROUNDS = 20
+
+
+def legacy_parse(html, coins):
+    """旧实现 (market_data._get_prices_from_528btc 原逻辑): 整页建树后每个币种 soup.find 一次"""
+    soup = BeautifulSoup(html, 'html.parser')
+    prices = {}
+    for coin in coins:
+        coin_element = soup.find('div', class_='walking_name', string=coin)
+        if coin_element:
+            parent = coin_element.parent
+            price_elem = parent.find('div', class_='walking_price')
+            change_elem = parent.find('div', class_='walking_change')
+            if price_elem and change_elem:
+                price = float(price_elem.text.strip().replace('$', '').replace(',', ''))
+                change = float(change_elem.text.strip().replace('%', ''))
+                prices[coin] = (price, change)
+    return prices
+
+
+def single_pass_parse(html, coins):
+    """新实现: 单次遍历后查表"""
+    tickers = parse_walking_items(html)
+    return {coin: tickers[coin] for coin in coins if coin in tickers}
+
+
+def timeit(func, html, coins):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        result = func(html, coins)
+    return (time.perf_counter() - start) / ROUNDS * 1000, result
+
+
+def main():
+    with open(FIXTURE, encoding='utf-8') as f:
+        html = f.read()
+
+    all_coins = list(parse_walking_items(html).keys())
+
+    if not HAS_BS4:
+        print("[WARN] SKIPPED legacy BeautifulSoup timings: beautifulsoup4 is not installed.")
+        print("[WARN] Only the single-pass parser is timed below; no speedup can be computed.")
+        print("[WARN] Install it to compare: pip install beautifulsoup4")
+
+    print("=" * 60)
+    print(f"528btc ticker parse benchmark ({len(html) // 1024} KB fixture, {ROUNDS} rounds)")
+    print("=" * 60)
+    print(f"{'coins':>6} {'legacy (ms)':>14} {'single-pass (ms)':>18} {'speedup':>9}")
+
+    for n in (1, 6, 15, len(all_coins)):
+        coins = all_coins[:n]
+        new_ms, new_result = timeit(single_pass_parse, html, coins)
+
+        if HAS_BS4:
+            old_ms, old_result = timeit(legacy_parse, html, coins)
+            if old_result != new_result:
+                print(f"[ERROR] Result mismatch for {n} coins")
+                return 1
+            print(f"{n:>6} {old_ms:>14.2f} {new_ms:>18.2f} {old_ms / new_ms:>8.1f}x")
+        else:
+            print(f"{n:>6} {'skipped':>14} {new_ms:>18.2f} {'n/a':>9}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
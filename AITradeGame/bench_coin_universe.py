@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark one trading cycle as the coin universe grows
+
+Each universe size gets a temporary database with 14 days of hourly candles
+per coin and a simulated price source (fixed 50 ms round trip, no network),
+then times: snapshot build (prices + indicators, cold and warm), prompt
+building, and a full engine cycle with a stub trader that holds everything
+(portfolio valuation, conversation and account value writes).
+"""
+import os
+import sys
+import tempfile
+import time
+from database import Database
+from market_data import MarketDataFetcher
+from market_snapshot import MarketSnapshotService
+from symbol_registry import SymbolRegistry
+from trading_engine import TradingEngine
+
+try:
+    from ai_trader import AITrader
+    HAS_OPENAI = True
+except ImportError:
+    HAS_OPENAI = False
+
+SIZES = (6, 50, 200, 500)
+SOURCE_LATENCY = 0.05
+HOURS = 14 * 24
+
+
+class StubTrader:
+    """Builds the real prompt, then holds every coin without calling an LLM"""
+
+    def __init__(self):
+        self.prompt_ms = 0.0
+        self.prompt_size = 0
+        self._prompt_builder = AITrader('bench', 'http://localhost', 'bench') if HAS_OPENAI else None
+
+    def make_decision(self, market_state, portfolio, account_info, timeout=None, on_decision=None):
+        if self._prompt_builder:
+            start = time.perf_counter()
+            prompt = self._prompt_builder._build_prompt(market_state, portfolio, account_info)
+            self.prompt_ms = (time.perf_counter() - start) * 1000
+            self.prompt_size = len(prompt)
+        return {coin: {'signal': 'hold'} for coin in market_state}
+
+
+def build_universe(db, registry, n):
+    coins = registry.coins()[:n]
+    for i in range(len(coins), n):
+        symbol = f"C{i:04d}"
+        registry.add(symbol, coingecko_id=f"bench-coin-{i}")
+        coins.append(symbol)
+
+    now_ms = int(time.time() * 1000)
+    start_ms = now_ms - now_ms % 3600000 - (HOURS - 1) * 3600000
+    for index, coin in enumerate(coins):
+        base = 100.0 + index
+        candles = []
+        for h in range(HOURS):
+            close = base * (1 + 0.01 * ((h * 7 + index) % 13 - 6) / 6)
+            candles.append((start_ms + h * 3600000, close, close * 1.002, close * 0.998, close, 1000.0))
+        db.upsert_candles(coin, '1h', candles)
+    return coins
+
+
+def make_fetcher(db, registry):
+    fetcher = MarketDataFetcher(data_source_priority=['binance'], candle_store=db, symbol_registry=registry)
+
+    def simulated_source(coins):
+        time.sleep(SOURCE_LATENCY)
+        return {coin: {'price': 100.0 + i, 'change_24h': 0.5} for i, coin in enumerate(coins)}
+
+    fetcher._get_prices_from_binance = simulated_source
+    # 基准测试只读本地K线，不触发网络同步
+    now = time.time()
+    for coin in registry.coins():
+        fetcher._candle_sync_time[coin] = now
+    return fetcher
+
+
+def run(n):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        db.init_db()
+        registry = SymbolRegistry(db)
+        coins = build_universe(db, registry, n)
+
+        fetcher = make_fetcher(db, registry)
+        service = MarketSnapshotService(fetcher, symbol_registry=registry)
+
+        start = time.perf_counter()
+        snapshot = service.build_snapshot()
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        fetcher._price_cache.clear()
+        start = time.perf_counter()
+        snapshot = service.build_snapshot()
+        warm_ms = (time.perf_counter() - start) * 1000
+
+        provider_id = db.add_provider('bench', 'http://localhost', 'bench')
+        model_id = db.add_model('bench', provider_id, 'bench', initial_capital=100000)
+        for coin in coins[:20]:
+            db.update_position(model_id, coin, 1.0, 100.0, 2, 'long')
+
+        trader = StubTrader()
+        engine = TradingEngine(model_id, db, fetcher, trader, symbol_registry=registry)
+        start = time.perf_counter()
+        result = engine.execute_trading_cycle(snapshot)
+        cycle_ms = (time.perf_counter() - start) * 1000
+        fetcher.close()
+
+        if not result.get('success') or len(snapshot) != n:
+            print(f"[ERROR] {n} coins: cycle failed ({result.get('error')}, snapshot {len(snapshot)})")
+            return False
+
+        prompt_ms = f"{trader.prompt_ms:.2f}" if HAS_OPENAI else '-'
+        print(f"{n:>6} {cold_ms:>12.1f} {warm_ms:>12.1f} {prompt_ms:>11} {trader.prompt_size / 1024:>10.1f} {cycle_ms:>10.1f}")
+        return True
+
+
+def main():
+    if not HAS_OPENAI:
+        print("[WARN] openai not installed, skipping prompt timings")
+
+    print("=" * 66)
+    print(f"Trading cycle vs coin universe ({HOURS} hourly candles/coin, {SOURCE_LATENCY * 1000:.0f} ms source)")
+    print("=" * 66)
+    print(f"{'coins':>6} {'cold (ms)':>12} {'warm (ms)':>12} {'prompt (ms)':>11} {'prompt KB':>10} {'cycle (ms)':>10}")
+
+    ok = all(run(n) for n in SIZES)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
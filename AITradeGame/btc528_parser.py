@@ -0,0 +1,112 @@
+"""
+528btc ticker parser - Single-pass extraction of the homepage walking ticker
+"""
+from html.parser import HTMLParser
+from typing import Dict, Tuple
+
+TICKER_FIELDS = {
+    'walking_item': 'item',
+    'walking_name': 'name',
+    'walking_price': 'price',
+    'walking_change': 'change',
+}
+
+
+class _WalkingTickerParser(HTMLParser):
+    """流式扫描 walking_item，一次遍历收集所有币种"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.items = []
+        self._stack = []  # 每层 div 对应的字段名 (非 ticker div 为 None)
+        self._current = None
+        self._text = []
+
+    def _flush(self):
+        if self._current and 'name' in self._current:
+            self.items.append(self._current)
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'div':
+            return
+
+        field = None
+        for cls in (dict(attrs).get('class') or '').split():
+            if cls in TICKER_FIELDS:
+                field = TICKER_FIELDS[cls]
+                break
+
+        if field == 'item' or (field == 'name' and self._current and 'name' in self._current):
+            self._flush()
+        if field and field != 'item':
+            if self._current is None:
+                self._current = {}
+            self._text = []
+
+        self._stack.append(field)
+
+    def handle_endtag(self, tag):
+        if tag != 'div' or not self._stack:
+            return
+
+        field = self._stack.pop()
+        if field and field != 'item' and self._current is not None:
+            self._current[field] = ''.join(self._text).strip()
+            self._text = []
+
+    def handle_data(self, data):
+        if self._stack and self._stack[-1] not in (None, 'item'):
+            self._text.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _ticker_fragment(html: str) -> str:
+    """截取 ticker 所在的片段，跳过页面其余部分"""
+    first = html.find('walking_')
+    if first < 0:
+        return ''
+    start = html.rfind('<', 0, first)
+    last = html.rfind('walking_')
+    end = html.find('</div>', last)
+    end = len(html) if end < 0 else end + len('</div>')
+    return html[max(start, 0):end]
+
+
+def parse_walking_items(html: str) -> Dict[str, Tuple[float, float]]:
+    """
+    Parse every walking_item on the 528btc homepage in one pass
+
+    Returns:
+        Dict: {symbol: (price, change_24h)}; items with an unparsable price are skipped
+    """
+    fragment = _ticker_fragment(html)
+    if not fragment:
+        return {}
+
+    parser = _WalkingTickerParser()
+    parser.feed(fragment)
+    parser.close()
+
+    tickers = {}
+    for item in parser.items:
+        symbol = item['name']
+        if symbol in tickers:
+            continue
+
+        try:
+            price = float(item.get('price', '').replace('$', '').replace(',', ''))
+        except ValueError:
+            continue
+
+        try:
+            change_24h = float(item.get('change', '').replace('%', '').replace('+', ''))
+        except ValueError:
+            change_24h = 0.0
+
+        tickers[symbol] = (price, change_24h)
+
+    return tickers
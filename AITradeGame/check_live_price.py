@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """Check if 528btc.com prices are updating"""
 import requests
-from bs4 import BeautifulSoup
 import time
 from datetime import datetime
+from btc528_parser import parse_walking_items
 
 def get_prices():
     """Fetch current prices from 528btc.com"""
@@ -12,20 +12,13 @@ def get_prices():
     }
 
     response = requests.get('https://www.528btc.com/', headers=headers, timeout=10)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    tickers = parse_walking_items(response.text)
 
     prices = {}
     for coin in ['BTC', 'ETH', 'BNB', 'SOL', 'XRP', 'DOGE']:
-        coin_element = soup.find('div', class_='walking_name', string=coin)
-        if coin_element:
-            parent = coin_element.parent
-            price_elem = parent.find('div', class_='walking_price')
-            change_elem = parent.find('div', class_='walking_change')
-
-            if price_elem and change_elem:
-                price = price_elem.text.strip().replace('$', '').replace(',', '')
-                change = change_elem.text.strip().replace('%', '')
-                prices[coin] = {'price': price, 'change': change}
+        if coin in tickers:
+            price, change = tickers[coin]
+            prices[coin] = {'price': price, 'change': change}
 
     return prices
 
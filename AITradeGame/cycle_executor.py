@@ -0,0 +1,176 @@
+"""
+Cycle executor module - Run every model's decision cycle concurrently with provider limits and deadlines
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict
+
+
+class CycleExecutor:
+    """
+    Concurrent trading cycle runner
+
+    Models are dispatched to a shared thread pool (the global cap). Each
+    provider has its own queue and is only handed to the pool while it has
+    fewer than `per_provider_limit` decisions in flight, so a provider with
+    many models never fills the pool with threads that just wait for a slot
+    and other providers' models start immediately. Every model gets a deadline:
+    its LLM call is given only the remaining time as a timeout, and a model
+    still running when the deadline passes is cancelled — decisions not yet
+    executed are discarded. The engine then has `cancel_grace` seconds to
+    report what it executed before the cancel (cancelled=True, partial=True);
+    every cancelled or timed-out model is reported with success=False and
+    cancelled=True. Cycle wall time is therefore bounded by the slowest model
+    (or the deadline plus the grace), not the sum of all models.
+    """
+
+    def __init__(self, max_workers: int = 8, per_provider_limit: int = 2,
+                 model_deadline: float = 150.0, provider_limits: Dict = None, deadlines: Dict = None,
+                 cancel_grace: float = 5.0):
+        """
+        Args:
+            max_workers: 同时执行的模型数上限 (全局)
+            per_provider_limit: 每个提供商同时进行的决策数上限
+            model_deadline: 单个模型一个周期的最长耗时 (秒)
+            provider_limits: 按提供商覆盖并发上限 {provider_id: 数量}
+            deadlines: 按模型覆盖截止时间 {model_id: 秒}
+            cancel_grace: 超时取消后等待引擎返回取消结果 (含已执行交易) 的秒数
+        """
+        self.max_workers = max_workers
+        self.per_provider_limit = per_provider_limit
+        self.model_deadline = model_deadline
+        self.provider_limits = dict(provider_limits or {})
+        self.deadlines = dict(deadlines or {})
+        self.cancel_grace = cancel_grace
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cycle')
+        self._lock = threading.Lock()
+        self._queues = {}  # provider -> deque of 等待提交到线程池的模型
+        self._inflight = {}  # provider -> 已提交 (含超时后仍在等待LLM返回) 的模型数
+        self._active = {}  # model_id -> cancel event (当前周期)
+        self._running = {}  # model_id -> Future，超时取消的线程可能仍在等待LLM返回
+
+    @staticmethod
+    def provider_key(engine):
+        trader = engine.ai_trader
+        provider_id = getattr(trader, 'provider_id', None)
+        return provider_id if provider_id is not None else getattr(trader, 'api_url', None)
+
+    def _dispatch(self, key):
+        """Hand queued models of one provider to the pool while it has free slots"""
+        limit = self.provider_limits.get(key, self.per_provider_limit)
+        while True:
+            with self._lock:
+                queue = self._queues.get(key)
+                if not queue or self._inflight.get(key, 0) >= limit:
+                    return
+                job = queue.popleft()
+                self._inflight[key] = self._inflight.get(key, 0) + 1
+            self._pool.submit(self._run_job, key, job)
+
+    def _run_job(self, key, job):
+        engine, snapshot, deadline, cancel_event, future = job
+        try:
+            if not future.set_running_or_notify_cancel():
+                return  # 排队期间已超时取消
+            try:
+                if cancel_event.is_set():
+                    result = {'success': False, 'cancelled': True, 'error': 'cancelled'}
+                elif time.monotonic() >= deadline:
+                    # 等待提供商配额的时间也计入截止时间
+                    result = {'success': False, 'cancelled': True, 'error': 'deadline exceeded waiting for provider slot'}
+                else:
+                    result = engine.execute_trading_cycle(snapshot, deadline=deadline, cancel_event=cancel_event)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight[key] -= 1
+            self._dispatch(key)
+
+    def run_cycle(self, engines: Dict, snapshot=None) -> Dict:
+        """
+        Execute one cycle for every engine and wait for all of them
+
+        Returns:
+            {model_id: result}; timed-out or cancelled models get success=False
+        """
+        start = time.monotonic()
+        results = {}
+        futures = {}
+        deadlines = {}
+        for model_id, engine in engines.items():
+            previous = self._running.get(model_id)
+            if previous is not None and not previous.done():
+                # 同一引擎不并发执行两个周期
+                results[model_id] = {'success': False, 'error': 'previous cycle still running'}
+                continue
+            deadline = start + self.deadlines.get(model_id, self.model_deadline)
+            cancel_event = threading.Event()
+            with self._lock:
+                self._active[model_id] = cancel_event
+            deadlines[model_id] = deadline
+            future = Future()
+            key = self.provider_key(engine)
+            with self._lock:
+                self._queues.setdefault(key, deque()).append((engine, snapshot, deadline, cancel_event, future))
+            futures[model_id] = future
+            self._running[model_id] = future
+
+        for key in list(self._queues):
+            self._dispatch(key)
+
+        pending = set(futures)
+        grace_until = {}  # 已取消、等待引擎报告取消结果的模型
+        while pending:
+            next_wakeup = min(grace_until.get(model_id, deadlines[model_id]) for model_id in pending)
+            wait([futures[model_id] for model_id in pending],
+                 timeout=max(0.0, next_wakeup - time.monotonic()), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for model_id in list(pending):
+                future = futures[model_id]
+                if future.done():
+                    if future.cancelled():
+                        results[model_id] = {'success': False, 'cancelled': True,
+                                             'error': 'deadline exceeded waiting for provider slot'}
+                    else:
+                        try:
+                            results[model_id] = future.result()
+                        except Exception as e:
+                            results[model_id] = {'success': False, 'error': str(e)}
+                    pending.discard(model_id)
+                elif model_id not in grace_until and now >= deadlines[model_id]:
+                    # 尚在提供商队列中的直接取消；已运行的线程无法强制终止: 标记取消，
+                    # 引擎丢弃未执行的决策，并在宽限期内返回取消前已执行的交易
+                    self.cancel(model_id)
+                    if not future.cancel():
+                        grace_until[model_id] = now + self.cancel_grace
+                elif model_id in grace_until and now >= grace_until[model_id]:
+                    # 引擎仍在等待LLM返回 (其占用的提供商配额直到返回才释放)
+                    results[model_id] = {'success': False, 'cancelled': True, 'error': 'deadline exceeded, cycle cancelled'}
+                    pending.discard(model_id)
+
+        with self._lock:
+            for model_id in futures:
+                self._active.pop(model_id, None)
+        return results
+
+    def cancel(self, model_id=None):
+        """Cancel one model's running cycle, or all of them when model_id is None"""
+        with self._lock:
+            events = list(self._active.values()) if model_id is None else [self._active.get(model_id)]
+        for event in events:
+            if event is not None:
+                event.set()
+
+    def shutdown(self):
+        self.cancel()
+        with self._lock:
+            queued = [job for queue in self._queues.values() for job in queue]
+            self._queues.clear()
+        for job in queued:
+            job[-1].cancel()
+        self._pool.shutdown(wait=False)
@@ -106,6 +106,52 @@ class Database:
             )
         ''')
 
+        # Candles table (本地K线存储，增量同步，供技术指标计算)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS candles (
+                coin TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                open_time INTEGER NOT NULL,  -- 毫秒时间戳
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume REAL DEFAULT 0,
+                PRIMARY KEY (coin, interval, open_time)
+            )
+        ''')
+
+        # Market ticks table (原始价格记录，后台批量写入，汇总为K线后按保留期清理)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS market_ticks (
+                coin TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,  -- 毫秒时间戳
+                price REAL NOT NULL,
+                source TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_market_ticks_time ON market_ticks (timestamp, coin)
+        ''')
+
+        # Symbols table (币种注册表，各数据源的交易对/ID映射)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS symbols (
+                symbol TEXT PRIMARY KEY,
+                binance_symbol TEXT,
+                coingecko_id TEXT,
+                enabled INTEGER DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('SELECT COUNT(*) FROM symbols')
+        if cursor.fetchone()[0] == 0:
+            from symbol_registry import DEFAULT_SYMBOLS
+            cursor.executemany('''
+                INSERT INTO symbols (symbol, binance_symbol, coingecko_id) VALUES (?, ?, ?)
+            ''', DEFAULT_SYMBOLS)
+
         # Settings table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS settings (
@@ -491,6 +537,196 @@ class Database:
         conn.close()
         return chart_data
 
+    # ============ Candle Store ============
+
+    def upsert_candles(self, coin: str, interval: str, candles: List[tuple]):
+        """Insert or replace candles
+
+        Args:
+            candles: [(open_time_ms, open, high, low, close, volume), ...]
+        """
+        if not candles:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT OR REPLACE INTO candles (coin, interval, open_time, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(coin, interval) + tuple(c) for c in candles])
+        conn.commit()
+        conn.close()
+
+    def get_last_candle_time(self, coin: str, interval: str) -> Optional[int]:
+        """Get open_time (ms) of the newest stored candle"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT MAX(open_time) as last_time FROM candles WHERE coin = ? AND interval = ?
+        ''', (coin, interval))
+        row = cursor.fetchone()
+        conn.close()
+        return row['last_time'] if row else None
+
+    def get_candles(self, coin: str, interval: str, since: int = None, limit: int = None) -> List[Dict]:
+        """Get candles in ascending open_time order
+
+        Args:
+            since: Only candles with open_time >= since (ms)
+            limit: Only the newest `limit` candles
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT open_time, open, high, low, close, volume FROM candles
+            WHERE coin = ? AND interval = ? AND open_time >= ?
+            ORDER BY open_time DESC LIMIT ?
+        ''', (coin, interval, since or 0, limit if limit else -1))
+        rows = cursor.fetchall()
+        conn.close()
+        return [dict(row) for row in reversed(rows)]
+
+    def get_candles_bulk(self, coins: List[str], interval: str, since: int = None) -> Dict[str, List[Dict]]:
+        """Get candles for many coins with one query per 500 coins, ascending open_time per coin"""
+        candles = {coin: [] for coin in coins}
+        if not coins:
+            return candles
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        coins = list(coins)
+        for start in range(0, len(coins), 500):
+            chunk = coins[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(f'''
+                SELECT coin, open_time, open, high, low, close, volume FROM candles
+                WHERE interval = ? AND open_time >= ? AND coin IN ({placeholders})
+                ORDER BY coin, open_time
+            ''', [interval, since or 0] + chunk)
+            for row in cursor.fetchall():
+                candle = dict(row)
+                candles[candle.pop('coin')].append(candle)
+        conn.close()
+        return candles
+
+    def merge_candles(self, interval: str, bars_by_coin: Dict[str, List[tuple]]):
+        """Merge bars into existing candles: keep open, widen high/low, take the new close
+
+        Used by tick rollups, so re-aggregating a partial bucket is idempotent
+        and never discards data written by a remote sync.
+
+        Args:
+            bars_by_coin: {coin: [(open_time_ms, open, high, low, close, volume), ...]}
+        """
+        rows = [(coin, interval) + tuple(bar) for coin, bars in bars_by_coin.items() for bar in bars]
+        if not rows:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO candles (coin, interval, open_time, open, high, low, close, volume)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(coin, interval, open_time) DO UPDATE SET
+                high = MAX(high, excluded.high),
+                low = MIN(low, excluded.low),
+                close = excluded.close
+        ''', rows)
+        conn.commit()
+        conn.close()
+
+    def delete_candles_before(self, interval: str, before: int) -> int:
+        """Delete candles of one interval older than `before` (ms)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM candles WHERE interval = ? AND open_time < ?', (interval, before))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+
+    # ============ Market Ticks ============
+
+    def insert_ticks(self, ticks: List[tuple]):
+        """Bulk insert [(coin, timestamp_ms, price, source), ...]"""
+        if not ticks:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO market_ticks (coin, timestamp, price, source) VALUES (?, ?, ?, ?)
+        ''', ticks)
+        conn.commit()
+        conn.close()
+
+    def get_ticks(self, since: int, until: int = None, coin: str = None) -> List[tuple]:
+        """Get (coin, timestamp, price) ordered by coin then time"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        query = 'SELECT coin, timestamp, price FROM market_ticks WHERE timestamp >= ?'
+        params = [since]
+        if until is not None:
+            query += ' AND timestamp < ?'
+            params.append(until)
+        if coin is not None:
+            query += ' AND coin = ?'
+            params.append(coin)
+        cursor.execute(query + ' ORDER BY coin, timestamp', params)
+        rows = [tuple(row) for row in cursor.fetchall()]
+        conn.close()
+        return rows
+
+    def delete_ticks_before(self, before: int) -> int:
+        """Delete ticks older than `before` (ms)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM market_ticks WHERE timestamp < ?', (before,))
+        deleted = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return deleted
+
+    # ============ Symbol Registry ============
+
+    def get_symbols(self, enabled_only: bool = False) -> List[Dict]:
+        """Get registered symbols in insertion order"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        query = 'SELECT symbol, binance_symbol, coingecko_id, enabled FROM symbols'
+        if enabled_only:
+            query += ' WHERE enabled = 1'
+        cursor.execute(query + ' ORDER BY rowid')
+        rows = cursor.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def upsert_symbol(self, symbol: str, binance_symbol: str = None, coingecko_id: str = None,
+                      enabled: bool = True):
+        """Add a symbol or update its source mappings"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO symbols (symbol, binance_symbol, coingecko_id, enabled)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                binance_symbol = excluded.binance_symbol,
+                coingecko_id = excluded.coingecko_id,
+                enabled = excluded.enabled
+        ''', (symbol, binance_symbol, coingecko_id, 1 if enabled else 0))
+        conn.commit()
+        conn.close()
+
+    def set_symbol_enabled(self, symbol: str, enabled: bool):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('UPDATE symbols SET enabled = ? WHERE symbol = ?', (1 if enabled else 0, symbol))
+        conn.commit()
+        conn.close()
+
+    def delete_symbol(self, symbol: str):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM symbols WHERE symbol = ?', (symbol,))
+        conn.commit()
+        conn.close()
+
     # ============ Settings Management ============
 
     def get_settings(self) -> Dict:
@@ -0,0 +1,219 @@
+"""
+Decision parser module - Incremental parsing and validation of the decision JSON
+"""
+import json
+from typing import Dict, List, Tuple
+
+SIGNALS = ('buy_to_enter', 'sell_to_enter', 'hold', 'close_position')
+ENTRY_SIGNALS = ('buy_to_enter', 'sell_to_enter')
+MAX_LEVERAGE = 20
+
+# 结构化输出模式下发送给提供商的 response schema (币种名不固定，用 additionalProperties 描述)
+DECISION_SCHEMA = {
+    'type': 'object',
+    'additionalProperties': {
+        'type': 'object',
+        'properties': {
+            'signal': {'type': 'string', 'enum': list(SIGNALS)},
+            'quantity': {'type': 'number', 'minimum': 0},
+            'leverage': {'type': 'integer', 'minimum': 1, 'maximum': MAX_LEVERAGE},
+            'profit_target': {'type': 'number'},
+            'stop_loss': {'type': 'number'},
+            'confidence': {'type': 'number', 'minimum': 0, 'maximum': 1},
+            'justification': {'type': 'string'}
+        },
+        'required': ['signal']
+    }
+}
+
+
+class IncrementalDecisionParser:
+    """
+    Parse {"COIN": {...}, ...} while it is still being generated
+
+    feed() scans only the new characters, tracking string/escape state and
+    nesting depth. Each coin's object is decoded the moment its closing brace
+    arrives, so the caller can act on it before the rest of the response is
+    generated; `complete` turns True when the outer object closes, at which
+    point the stream can be abandoned. Text before the first '{' (code
+    fences, preamble) is skipped.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.decisions = {}
+        self.complete = False
+
+        self._pos = 0
+        self._start = None  # 外层对象起点
+        self._end = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._key = None
+        self._key_start = None
+        self._value_start = None
+
+    def feed(self, text: str) -> List[Tuple[str, Dict]]:
+        """Append streamed text; returns the (coin, decision) pairs completed by it"""
+        self.buffer += text
+        if self.complete:
+            return []
+
+        buf = self.buffer
+        completed = []
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if self._start is None:
+                if ch == '{':
+                    self._start = i
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(buf[self._key_start:i + 1])
+                        self._key_start = None
+            elif ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._key is None:
+                    self._key_start = i
+            elif ch == '{' or ch == '[':
+                if self._depth == 1 and ch == '{':
+                    self._value_start = i
+                self._depth += 1
+            elif ch == '}' or ch == ']':
+                self._depth -= 1
+                if self._depth == 1 and self._value_start is not None:
+                    entry = self._decode(buf[self._value_start:i + 1])
+                    if self._key is not None and isinstance(entry, dict):
+                        self.decisions[self._key] = entry
+                        completed.append((self._key, entry))
+                    self._value_start = None
+                elif self._depth == 0:
+                    self._end = i + 1
+                    self.complete = True
+                    i += 1
+                    break
+            elif ch == ',' and self._depth == 1:
+                self._key = None
+            i += 1
+
+        self._pos = i
+        return completed
+
+    @staticmethod
+    def _decode(text: str):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
+
+    def json_text(self) -> str:
+        """The outer JSON object (whole if complete, partial otherwise)"""
+        if self._start is None:
+            return ''
+        return self.buffer[self._start:self._end]
+
+
+def _number(value) -> float:
+    if isinstance(value, bool):
+        raise ValueError('boolean is not a number')
+    return float(value)  # 接受数字字符串 "0.5"
+
+
+class DecisionValidator:
+    """
+    Validate and normalize one coin's decision against the decision schema
+
+    The field checks are built once as a tuple of (field, signals that
+    require it, converter, check, message), so validating a coin is a single
+    pass with no schema interpretation. Cheap fixes are applied in place
+    (signal case, numeric strings, leverage clamped to 1..max, confidence
+    given as a percentage); optional fields that are still invalid are
+    dropped. Only problems that make the decision unusable are reported as
+    errors, for the caller to send back to the model.
+    """
+
+    def __init__(self, max_leverage: int = MAX_LEVERAGE):
+        def leverage(value):
+            return min(max(int(round(_number(value))), 1), max_leverage)
+
+        def confidence(value):
+            value = _number(value)
+            return value / 100 if 1 < value <= 100 else value
+
+        def positive(value):
+            return value > 0
+
+        self._fields = (
+            ('quantity', ENTRY_SIGNALS, _number, positive, 'must be greater than 0'),
+            ('leverage', (), leverage, None, None),  # 缺省时引擎按 1 倍处理
+            ('profit_target', (), _number, positive, 'must be greater than 0'),
+            ('stop_loss', (), _number, positive, 'must be greater than 0'),
+            ('confidence', (), confidence, lambda v: 0 <= v <= 1, 'must be between 0 and 1'),
+        )
+        self._signal_error = f"signal must be one of {'|'.join(SIGNALS)}"
+
+    def validate(self, decision) -> Tuple[Dict, List[str]]:
+        """
+        Returns:
+            (normalized decision, errors); the decision is None when errors is non-empty
+        """
+        if not isinstance(decision, dict):
+            return None, ['decision must be a JSON object']
+
+        signal = decision.get('signal')
+        if isinstance(signal, str):
+            signal = signal.strip().lower()
+        if signal not in SIGNALS:
+            return None, [self._signal_error]
+
+        result = dict(decision)
+        result['signal'] = signal
+        errors = []
+        for field, required_for, convert, check, message in self._fields:
+            value = decision.get(field)
+            required = signal in required_for
+            if value is None:
+                if required:
+                    errors.append(f"{field} is required for {signal}")
+                continue
+            try:
+                value = convert(value)
+            except (TypeError, ValueError):
+                if required:
+                    errors.append(f"{field} must be a number")
+                result.pop(field, None)
+                continue
+            if check is not None and not check(value):
+                if required:
+                    errors.append(f"{field} {message}")
+                result.pop(field, None)
+                continue
+            result[field] = value
+
+        if errors:
+            return None, errors
+        return result, []
+
+    def validate_all(self, decisions: Dict) -> Tuple[Dict, Dict]:
+        """
+        Returns:
+            ({coin: normalized decision}, {coin: [errors]})
+        """
+        valid = {}
+        invalid = {}
+        for coin, decision in decisions.items():
+            normalized, errors = self.validate(decision)
+            if errors:
+                invalid[coin] = errors
+            else:
+                valid[coin] = normalized
+        return valid, invalid
@@ -0,0 +1,48 @@
+"""
+HTTP session module - Pooled keep-alive sessions for market data sources
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def create_session(pool_connections: int = 10, pool_maxsize: int = 10,
+                   max_retries: int = 2, backoff_factor: float = 0.3,
+                   read_retries: int = 0, connect_retries: int = 0) -> requests.Session:
+    """
+    创建带连接池和重试策略的 HTTP 会话
+
+    requests.Session 按主机维护 keep-alive 连接池，复用 TCP+TLS 连接，
+    避免每次请求重新握手。
+
+    Args:
+        pool_connections: 缓存的主机连接池数量 (每个数据源主机一个)
+        pool_maxsize: 每个主机连接池的最大连接数 (应不小于并发抓取线程数)
+        max_retries: 502/503/504 响应的重试次数 (总重试次数上限)
+        backoff_factor: 重试退避系数，第 n 次重试前等待 backoff_factor * 2^(n-1) 秒
+        read_retries: 读取超时的重试次数，默认不重试 —— 每次重试都要再等满整个超时，
+            慢数据源应尽快交给对冲或下一个数据源
+        connect_retries: 连接失败 (含连接超时) 的重试次数，默认不重试 —— 连接超时同样要等满
+            整个超时，不可达的主机应立即失败，由下一个数据源接替
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=connect_retries,
+        read=read_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
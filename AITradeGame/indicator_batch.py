@@ -0,0 +1,167 @@
+"""
+Indicator batch module - Vectorized NumPy indicators across many coins
+
+All functions take a 2-D price matrix of shape (coins, time), oldest
+column first, and compute every coin in the same array operations.
+Recursive indicators (EMA, Wilder smoothing) loop over the time axis
+only; each step is a vector operation across all coins.
+"""
+from typing import Dict, List, Optional
+import numpy as np
+
+
+def _ema_series(values: np.ndarray, alpha: float, seed_length: int) -> np.ndarray:
+    """EMA along axis 1, seeded with the mean of the first seed_length columns"""
+    n_coins, n_points = values.shape
+    out = np.full((n_coins, n_points), np.nan)
+    if n_points < seed_length:
+        return out
+
+    ema = values[:, :seed_length].mean(axis=1)
+    out[:, seed_length - 1] = ema
+    for t in range(seed_length, n_points):
+        ema = alpha * values[:, t] + (1 - alpha) * ema
+        out[:, t] = ema
+    return out
+
+
+def _wilder_last(values: np.ndarray, period: int) -> np.ndarray:
+    """Final Wilder-smoothed value along axis 1"""
+    series = _ema_series(values, 1.0 / period, period)
+    return series[:, -1]
+
+
+def compute_indicator_batch(prices: np.ndarray, high: Optional[np.ndarray] = None,
+                            low: Optional[np.ndarray] = None, sma_windows=(7, 14),
+                            ema_periods=(12, 26), rsi_period: int = 14, macd_periods=(12, 26, 9),
+                            bb_window: int = 20, bb_k: float = 2.0, atr_period: int = 14,
+                            vol_window: int = 24, periods_per_year: int = 24 * 365) -> Dict[str, np.ndarray]:
+    """
+    Compute a full indicator set for every coin in one pass
+
+    Args:
+        prices: Close prices, shape (coins, time)
+        high, low: Optional bar highs/lows of the same shape; ATR falls back to
+            close-to-close true range when omitted
+        periods_per_year: Bars per year, used to annualize realized volatility
+
+    Returns:
+        Dict[str, np.ndarray]: indicator name -> array of shape (coins,), NaN where
+        the history is too short
+    """
+    prices = np.asarray(prices, dtype=float)
+    n_coins, n_points = prices.shape
+    if n_points < 2:
+        raise ValueError("compute_indicator_batch needs at least 2 price points per coin")
+    result = {'current_price': prices[:, -1].copy()}
+
+    for window in sma_windows:
+        result[f'sma_{window}'] = prices[:, -window:].mean(axis=1) if n_points >= window else np.full(n_coins, np.nan)
+
+    ema_cache = {}
+    for period in set(ema_periods) | set(macd_periods[:2]):
+        ema_cache[period] = _ema_series(prices, 2.0 / (period + 1), period)
+    for period in ema_periods:
+        result[f'ema_{period}'] = ema_cache[period][:, -1]
+
+    # RSI (Wilder)
+    changes = np.diff(prices, axis=1)
+    avg_gain = _wilder_last(np.clip(changes, 0, None), rsi_period)
+    avg_loss = _wilder_last(np.clip(-changes, 0, None), rsi_period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    result[f'rsi_{rsi_period}'] = np.where(avg_loss == 0, 100.0, rsi)
+
+    # MACD
+    fast, slow, signal = macd_periods
+    macd_line = ema_cache[fast] - ema_cache[slow]
+    valid = macd_line[:, slow - 1:]
+    signal_line = _ema_series(valid, 2.0 / (signal + 1), signal)[:, -1] if valid.shape[1] else np.full(n_coins, np.nan)
+    result['macd'] = macd_line[:, -1]
+    result['macd_signal'] = signal_line
+    result['macd_hist'] = result['macd'] - signal_line
+
+    # Bollinger bands
+    if n_points >= bb_window:
+        window = prices[:, -bb_window:]
+        middle = window.mean(axis=1)
+        std = window.std(axis=1)
+    else:
+        middle = std = np.full(n_coins, np.nan)
+    result['bb_middle'] = middle
+    result['bb_upper'] = middle + bb_k * std
+    result['bb_lower'] = middle - bb_k * std
+
+    # ATR (Wilder)
+    prev_close = prices[:, :-1]
+    if high is not None and low is not None:
+        high = np.asarray(high, dtype=float)[:, 1:]
+        low = np.asarray(low, dtype=float)[:, 1:]
+        true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    else:
+        true_range = np.abs(changes)
+    result[f'atr_{atr_period}'] = _wilder_last(true_range, atr_period)
+
+    # Realized volatility (annualized, log returns)
+    if n_points > vol_window:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_returns = np.diff(np.log(prices[:, -vol_window - 1:]), axis=1)
+        result['volatility'] = log_returns.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+    else:
+        result['volatility'] = np.full(n_coins, np.nan)
+
+    return result
+
+
+class IndicatorBatch:
+    """Compact batch result: one array per indicator, one row per coin"""
+
+    def __init__(self, coins: List[str], arrays: Dict[str, np.ndarray]):
+        self.coins = list(coins)
+        self.arrays = arrays
+        self._index = {coin: i for i, coin in enumerate(self.coins)}
+
+    def __contains__(self, coin: str) -> bool:
+        return coin in self._index
+
+    def for_coin(self, coin: str) -> Dict[str, float]:
+        """Plain-float indicator dict for one coin, skipping NaN values"""
+        i = self._index[coin]
+        values = {}
+        for name, array in self.arrays.items():
+            value = float(array[i])
+            if not np.isnan(value):
+                values[name] = value
+        return values
+
+
+def build_price_matrices(histories: Dict[str, List[float]], min_points: int = 2,
+                         highs: Dict[str, List[float]] = None, lows: Dict[str, List[float]] = None):
+    """
+    Group per-coin price lists into (coins, time) matrices of equal length
+
+    Coins are grouped by history length, so every coin keeps its full series
+    (a newly listed coin with a short history no longer truncates the
+    others); coins with fewer than min_points prices are dropped. Highs and
+    lows are included for coins that have both with the same length as
+    their closes, so ATR uses the real true range.
+
+    Returns:
+        [(coins, close_matrix, high_matrix or None, low_matrix or None), ...]
+    """
+    highs = highs or {}
+    lows = lows or {}
+    groups = {}
+    for coin, prices in histories.items():
+        if len(prices) < min_points:
+            continue
+        has_range = len(highs.get(coin) or ()) == len(prices) and len(lows.get(coin) or ()) == len(prices)
+        groups.setdefault((len(prices), has_range), []).append(coin)
+
+    matrices = []
+    for (_, has_range), coins in groups.items():
+        close = np.array([histories[coin] for coin in coins], dtype=float)
+        high = np.array([highs[coin] for coin in coins], dtype=float) if has_range else None
+        low = np.array([lows[coin] for coin in coins], dtype=float) if has_range else None
+        matrices.append((coins, close, high, low))
+    return matrices
@@ -0,0 +1,230 @@
+"""
+Indicator module - Incremental streaming indicators (SMA / EMA / Wilder RSI)
+"""
+import threading
+from collections import deque
+from typing import Dict, Iterable, List
+
+
+class StreamingIndicators:
+    """
+    Rolling indicator state for one coin
+
+    Prices arrive as (price, timestamp) ticks. Ticks are bucketed into bars
+    of interval_ms: a tick in a new bucket appends a bar, a tick in the
+    current bucket revises the bar's close, older ticks are ignored. Both
+    paths are O(1) regardless of window length.
+    """
+
+    def __init__(self, sma_windows=(7, 14), ema_periods=(12, 26), rsi_period: int = 14,
+                 change_window: int = 168, interval_ms: int = 3600 * 1000):
+        self.sma_windows = tuple(sma_windows)
+        self.ema_periods = tuple(ema_periods)
+        self.rsi_period = rsi_period
+        self.change_window = change_window
+        self.interval_ms = interval_ms
+
+        self.count = 0
+        self.last_bucket = None
+        self.last_timestamp = None
+        self._prev = None  # 当前K线之前的状态，用于修正当前K线
+
+        # 多保留一个价格，修正当前K线时回看窗口仍然完整
+        self._closes = deque(maxlen=max(self.sma_windows + (change_window + 1,)) + 1)
+        self._sums = {w: 0.0 for w in self.sma_windows}
+        self._ema = {p: None for p in self.ema_periods}
+        self._ema_seed = {p: 0.0 for p in self.ema_periods}
+        self._avg_gain = 0.0
+        self._avg_loss = 0.0
+
+    # ---- 状态保存/恢复 (修正当前K线时回退到上一根K线的状态) ----
+
+    def _save_state(self):
+        return (dict(self._ema), dict(self._ema_seed), self._avg_gain, self._avg_loss)
+
+    def _restore_state(self, state):
+        ema, ema_seed, self._avg_gain, self._avg_loss = state
+        self._ema = dict(ema)
+        self._ema_seed = dict(ema_seed)
+
+    def update(self, price: float, timestamp: int):
+        """Feed one tick (timestamp in ms)"""
+        bucket = timestamp - timestamp % self.interval_ms
+
+        if self.last_bucket is not None and bucket < self.last_bucket:
+            return
+
+        if bucket == self.last_bucket:
+            # 同一根K线内的新报价: 撤销上次收盘价的影响后重新计算
+            old_close = self._closes[-1]
+            for window in self.sma_windows:
+                self._sums[window] -= old_close
+                if len(self._closes) > window:
+                    self._sums[window] += self._closes[-window - 1]
+            self._closes.pop()
+            self.count -= 1
+            self._restore_state(self._prev)
+        else:
+            self._prev = self._save_state()
+            self.last_bucket = bucket
+
+        self._append(price)
+        self.last_timestamp = timestamp
+
+    def _append(self, price: float):
+        prev_close = self._closes[-1] if self._closes else None
+
+        # SMA: 维护滑动窗口累计和
+        for window in self.sma_windows:
+            self._sums[window] += price
+            if len(self._closes) >= window:
+                self._sums[window] -= self._closes[-window]
+
+        self._closes.append(price)
+        self.count += 1
+
+        # EMA: 前 period 个价格取简单平均作为种子
+        for period in self.ema_periods:
+            if self.count < period:
+                self._ema_seed[period] += price
+            elif self.count == period:
+                self._ema[period] = (self._ema_seed[period] + price) / period
+            else:
+                alpha = 2 / (period + 1)
+                self._ema[period] = price * alpha + self._ema[period] * (1 - alpha)
+
+        # Wilder RSI: 前 period 个变化取平均，之后 Wilder 平滑
+        if prev_close is not None:
+            change = price - prev_close
+            gain = change if change > 0 else 0.0
+            loss = -change if change < 0 else 0.0
+            n_changes = self.count - 1
+            period = self.rsi_period
+            if n_changes <= period:
+                self._avg_gain += (gain - self._avg_gain) / n_changes
+                self._avg_loss += (loss - self._avg_loss) / n_changes
+            else:
+                self._avg_gain = (self._avg_gain * (period - 1) + gain) / period
+                self._avg_loss = (self._avg_loss * (period - 1) + loss) / period
+
+    # ---- 持久化 (JSON 兼容，供重启后热启动) ----
+
+    def get_state(self) -> Dict:
+        def pack(state):
+            ema, ema_seed, avg_gain, avg_loss = state
+            return [list(ema.items()), list(ema_seed.items()), avg_gain, avg_loss]
+
+        return {
+            'count': self.count,
+            'last_bucket': self.last_bucket,
+            'last_timestamp': self.last_timestamp,
+            'prev': pack(self._prev) if self._prev else None,
+            'closes': list(self._closes),
+            'sums': list(self._sums.items()),
+            'current': pack(self._save_state()),
+        }
+
+    def set_state(self, state: Dict):
+        def unpack(packed):
+            ema, ema_seed, avg_gain, avg_loss = packed
+            return ({int(p): v for p, v in ema}, {int(p): v for p, v in ema_seed}, avg_gain, avg_loss)
+
+        self.count = state['count']
+        self.last_bucket = state['last_bucket']
+        self.last_timestamp = state['last_timestamp']
+        self._prev = unpack(state['prev']) if state['prev'] else None
+        self._closes.clear()
+        self._closes.extend(state['closes'])
+        self._sums = {int(w): v for w, v in state['sums']}
+        self._restore_state(unpack(state['current']))
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= max(self.sma_windows + (self.rsi_period,))
+
+    def snapshot(self) -> Dict:
+        """Current indicator values, same keys as calculate_technical_indicators"""
+        if not self.ready:
+            return {}
+
+        closes = self._closes
+        current = closes[-1]
+        indicators = {f'sma_{w}': self._sums[w] / w for w in self.sma_windows}
+
+        for period in self.ema_periods:
+            if self._ema[period] is not None:
+                indicators[f'ema_{period}'] = self._ema[period]
+
+        if self._avg_loss == 0:
+            rsi = 100
+        else:
+            rs = self._avg_gain / self._avg_loss
+            rsi = 100 - (100 / (1 + rs))
+        indicators[f'rsi_{self.rsi_period}'] = rsi
+
+        base = closes[-self.change_window - 1] if len(closes) > self.change_window else closes[0]
+        indicators['current_price'] = current
+        indicators['price_change_7d'] = ((current - base) / base) * 100 if base > 0 else 0
+        return indicators
+
+
+class IndicatorEngine:
+    """Per-coin streaming indicator states"""
+
+    def __init__(self, **indicator_options):
+        self._options = indicator_options
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, coin: str) -> StreamingIndicators:
+        state = self._states.get(coin)
+        if state is None:
+            state = self._states[coin] = StreamingIndicators(**self._options)
+        return state
+
+    def __contains__(self, coin: str) -> bool:
+        return coin in self._states
+
+    def coins(self) -> List[str]:
+        return list(self._states)
+
+    def last_bucket(self, coin: str):
+        """Open time (ms) of the newest bar consumed for coin, None if never fed"""
+        state = self._states.get(coin)
+        return state.last_bucket if state else None
+
+    def update(self, coin: str, price: float, timestamp: int):
+        """Feed one price tick (timestamp in ms)"""
+        with self._lock:
+            self._state(coin).update(price, timestamp)
+
+    def update_history(self, coin: str, history: Iterable[Dict]):
+        """Feed [{'timestamp': ms, 'price': p}, ...]; points already consumed are skipped"""
+        with self._lock:
+            state = self._state(coin)
+            for point in history:
+                timestamp = int(point['timestamp'])
+                if state.last_bucket is None or timestamp >= state.last_bucket:
+                    state.update(point['price'], timestamp)
+
+    def export_states(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {coin: state.get_state() for coin, state in self._states.items()}
+
+    def import_states(self, states: Dict[str, Dict], min_bucket: int = 0) -> int:
+        """Restore exported states; states whose last bar is older than min_bucket are skipped"""
+        restored = 0
+        with self._lock:
+            for coin, packed in states.items():
+                if (packed.get('last_bucket') or 0) < min_bucket:
+                    continue
+                state = StreamingIndicators(**self._options)
+                state.set_state(packed)
+                self._states[coin] = state
+                restored += 1
+        return restored
+
+    def snapshot(self, coin: str) -> Dict:
+        with self._lock:
+            state = self._states.get(coin)
+            return state.snapshot() if state else {}
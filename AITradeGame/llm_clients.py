@@ -0,0 +1,169 @@
+"""
+LLM client module - Long-lived pooled OpenAI-compatible clients shared per provider
+"""
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+import httpx  # openai 的依赖，随 openai 一起安装
+from openai import OpenAI
+
+
+def normalize_base_url(api_url: str) -> str:
+    """Normalize a provider URL to its /v1 base"""
+    base_url = api_url.rstrip('/')
+    if not base_url.endswith('/v1'):
+        if '/v1' in base_url:
+            base_url = base_url.split('/v1')[0] + '/v1'
+        else:
+            base_url = base_url + '/v1'
+    return base_url
+
+
+class LLMClientRegistry:
+    """
+    One pooled client per (base_url, api_key)
+
+    Creating OpenAI(...) per call builds a fresh HTTP connection pool, so
+    every decision paid a new TCP/TLS handshake. Here each provider gets one
+    client with keep-alive connections that every AITrader using it shares.
+
+    Callers borrow a client with `with registry.lease(...) as client:` for
+    the duration of one request. When a provider's URL or key changes (or it
+    is deleted) the superseded client is retired: new leases get a fresh
+    client, and the old one is closed only once its last lease is returned,
+    so a request already in flight is never cut off.
+    """
+
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 120.0, timeout: float = 120.0, max_retries: int = 2):
+        """
+        Args:
+            max_connections: 每个客户端的最大连接数
+            max_keepalive_connections: 保持的空闲连接数
+            keepalive_expiry: 空闲连接保留秒数 (需覆盖交易周期间隔才能复用)
+            timeout: 单次请求超时 (秒)
+            max_retries: openai 客户端内置的重试次数
+        """
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self._clients = {}  # (base_url, api_key) -> OpenAI
+        self._provider_keys = {}  # provider_id -> (base_url, api_key)
+        self._leases = {}  # OpenAI -> 正在使用的请求数
+        self._retired = set()  # 已被替换、等待最后一个租用归还后关闭的客户端
+        self._lock = threading.Lock()
+
+        self.stats = {'created': 0, 'reused': 0, 'closed': 0}
+
+    def _create(self, base_url: str, api_key: str) -> OpenAI:
+        http_client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=self.timeout
+        )
+        return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client,
+                      max_retries=self.max_retries)
+
+    @contextmanager
+    def lease(self, api_url: str, api_key: str, provider_id: int = None):
+        """
+        Borrow the shared client of a provider for one request
+
+        Args:
+            provider_id: 传入时记录该提供商当前使用的配置，配置变化后旧客户端退役
+        """
+        client = self._acquire(api_url, api_key, provider_id)
+        try:
+            yield client
+        finally:
+            self._release(client)
+
+    def _acquire(self, api_url: str, api_key: str, provider_id: int = None) -> OpenAI:
+        key = (normalize_base_url(api_url), api_key)
+        stale = None
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create(*key)
+                self._clients[key] = client
+                self.stats['created'] += 1
+            else:
+                self.stats['reused'] += 1
+
+            if provider_id is not None:
+                previous = self._provider_keys.get(provider_id)
+                self._provider_keys[provider_id] = key
+                if previous is not None and previous != key and previous not in self._provider_keys.values():
+                    stale = self._retire(previous)
+            self._leases[client] = self._leases.get(client, 0) + 1
+
+        if stale is not None:
+            self._close_client(stale)
+        return client
+
+    def _release(self, client: OpenAI):
+        stale = None
+        with self._lock:
+            count = self._leases.get(client, 0) - 1
+            if count > 0:
+                self._leases[client] = count
+            else:
+                self._leases.pop(client, None)
+                if client in self._retired:
+                    self._retired.discard(client)
+                    stale = client
+        if stale is not None:
+            self._close_client(stale)
+
+    def _retire(self, key):
+        """Drop a client from the registry (lock held); returns it if it can be closed now"""
+        client = self._clients.pop(key, None)
+        if client is None:
+            return None
+        if self._leases.get(client):
+            self._retired.add(client)  # 仍有请求在使用，归还时关闭
+            return None
+        return client
+
+    def evict_provider(self, provider_id: int):
+        """Forget a deleted provider; its client is closed once no provider or request uses it"""
+        stale = None
+        with self._lock:
+            key = self._provider_keys.pop(provider_id, None)
+            if key is not None and key not in self._provider_keys.values():
+                stale = self._retire(key)
+        if stale is not None:
+            self._close_client(stale)
+
+    def _close_client(self, client: OpenAI):
+        try:
+            client.close()
+            self.stats['closed'] += 1
+        except Exception as e:
+            print(f"[WARN] Failed to close LLM client: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, active=len(self._clients), retired=len(self._retired),
+                        leased=sum(self._leases.values()))
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values()) + list(self._retired)
+            self._clients.clear()
+            self._retired.clear()
+            self._leases.clear()
+            self._provider_keys.clear()
+        for client in clients:
+            self._close_client(client)
+
+
+# 进程内共享，所有 AITrader 默认使用
+default_registry = LLMClientRegistry()
@@ -1,56 +1,373 @@
 """
 Market data module - Multi-source market data integration
 """
-import requests
 import time
-import re
+import gzip
+import json
+import os
+import statistics
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, List
-from bs4 import BeautifulSoup
 from odaily_fetcher import OdailyFetcher
+from market_sources import (BINANCE_BASE_URL, BINANCE_BATCH_SIZE, BROWSER_HEADERS, BTC528_URL, COINGECKO_BASE_URL,
+                            COINGECKO_BATCH_SIZE, binance_ticker_requests, coingecko_price_requests,
+                            parse_528btc_prices, parse_binance_tickers, parse_coingecko_history,
+                            parse_coingecko_prices)
+from indicators import IndicatorEngine
+from source_health import SourceHealthTracker
+from tick_feed import BinanceTickFeed, TickBook
+from request_scheduler import RequestScheduler, PRIORITY_PRICE, PRIORITY_MARKET, PRIORITY_HISTORY
+from symbol_registry import SymbolRegistry
+from market_snapshot import is_tradable
+from tick_store import ROLLUP_FALLBACK, fill_candle_gaps
+
+try:
+    from indicator_batch import IndicatorBatch, build_price_matrices, compute_indicator_batch
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+from http_session import create_session
 
 class MarketDataFetcher:
     """Fetch real-time market data from multiple sources"""
 
-    def __init__(self, data_source_priority=None):
+    MARKETS_PAGE_SIZE = 250  # CoinGecko /coins/markets 单页上限
+    BINANCE_BATCH_SIZE = BINANCE_BATCH_SIZE  # 每次 ticker/24hr 请求的交易对数量
+    COINGECKO_BATCH_SIZE = COINGECKO_BATCH_SIZE  # 每次 simple/price 请求的币种数量
+
+    def __init__(self, data_source_priority=None, fetch_mode: str = 'sequential',
+                 hedge_delay: float = 2.0, http_pool_size: int = 10, http_retries: int = 2,
+                 candle_store=None, stale_while_revalidate: float = 0, cache_max_coins: int = 512,
+                 consensus_sources: int = 3, consensus_budget: float = 6.0,
+                 outlier_threshold: float = 2.0, rate_limits: Dict = None, symbol_registry=None,
+                 candle_sync_interval: float = 900, indicator_budget: float = 30.0, tick_writer=None):
         """
         初始化市场数据获取器
 
         Args:
             data_source_priority: 数据源优先级列表，例如 ['odaily', '528btc', 'binance', 'coingecko']
+            fetch_mode: 'sequential' 按优先级逐个尝试; 'hedged' 并发对冲请求，最先返回的完整结果胜出;
+                'consensus' 并发查询多个数据源，按币种取中位数并标记异常值
+            hedge_delay: 对冲模式下，当前数据源超过该秒数未返回时启动下一个数据源 (0 = 全部同时启动)
+            http_pool_size: 每个数据源主机的 keep-alive 连接池大小
+            http_retries: 连接错误和 5xx 响应的重试次数
+            candle_store: 本地K线存储 (Database)，为空时技术指标直接下载 CoinGecko 历史数据
+            stale_while_revalidate: 缓存过期后仍可直接返回旧数据的秒数，同时后台刷新 (0 = 关闭)
+            cache_max_coins: 价格缓存最多保留的币种数，超出后按 LRU 淘汰
+            consensus_sources: 共识模式同时查询的数据源数量
+            consensus_budget: 共识模式等待数据源返回的时间预算 (秒)
+            outlier_threshold: 偏离中位数超过该百分比的报价视为异常值
+            rate_limits: 按主机限速 {host: (每秒请求数, 突发容量)}，默认只限制 CoinGecko 免费接口
+            symbol_registry: 币种注册表 (SymbolRegistry)，提供各数据源的交易对/ID映射；为空时使用默认6个币种
+            candle_sync_interval: 同一币种历史数据重新下载的最短间隔 (秒)，期间当前K线由实时价格修正
+            indicator_budget: 批量计算指标时等待历史数据下载的时间上限 (秒)，未完成的下载在后台继续
+            tick_writer: 行情记录器 (TickWriter)，抓取到的价格写入 market_ticks 并汇总为本地K线
         """
-        self.btc528_base_url = "https://www.528btc.com"
-        self.binance_base_url = "https://api.binance.com/api/v3"
-        self.coingecko_base_url = "https://api.coingecko.com/api/v3"
+        # 共享连接池会话，跨交易周期和 Flask 请求复用
+        self.session = create_session(
+            pool_connections=10,
+            pool_maxsize=http_pool_size,
+            max_retries=http_retries
+        )
+
+        # CoinGecko 请求统一经过调度器: 令牌桶限速、价格优先于历史数据、相同请求合并
+        if rate_limits is None:
+            rate_limits = {'api.coingecko.com': (0.5, 5)}
+        self.scheduler = RequestScheduler(self.session, limits=rate_limits)
+
+        # 各数据源请求超时 (秒)
+        self.source_timeouts = {
+            'odaily': 15,
+            '528btc': 10,
+            'binance': 5,
+            'coingecko': 10
+        }
+
+        self.btc528_base_url = BTC528_URL
+        self.binance_base_url = BINANCE_BASE_URL
+        self.coingecko_base_url = COINGECKO_BASE_URL
 
         # 初始化Odaily获取器
-        self.odaily_fetcher = OdailyFetcher()
+        self.odaily_fetcher = OdailyFetcher(session=self.session, timeout=self.source_timeouts['odaily'])
 
         # 数据源优先级配置 (默认: Odaily > 528btc > Binance > CoinGecko)
         self.data_source_priority = data_source_priority or ['odaily', '528btc', 'binance', 'coingecko']
 
-        # Binance symbol mapping
-        self.binance_symbols = {
-            'BTC': 'BTCUSDT',
-            'ETH': 'ETHUSDT',
-            'SOL': 'SOLUSDT',
-            'BNB': 'BNBUSDT',
-            'XRP': 'XRPUSDT',
-            'DOGE': 'DOGEUSDT'
-        }
+        # 币种注册表: Binance 交易对和 CoinGecko ID 映射
+        self.symbol_registry = symbol_registry if symbol_registry is not None else SymbolRegistry()
+        self.symbol_registry.add_listener(self._on_symbols_changed)
 
-        # CoinGecko mapping for technical indicators
-        self.coingecko_mapping = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'SOL': 'solana',
-            'BNB': 'binancecoin',
-            'XRP': 'ripple',
-            'DOGE': 'dogecoin'
-        }
+        self.disabled_sources = frozenset()
+        self.fetch_mode = fetch_mode
+        self.hedge_delay = hedge_delay
+        self.consensus_sources = consensus_sources
+        self.consensus_budget = consensus_budget
+        self.outlier_threshold = outlier_threshold
+        self._config_lock = threading.Lock()
+        self.config_version = 1
+
+        # 流式行情 (WebSocket)，启用后优先从内存行情簿读取价格
+        self.tick_book = None
+        self.tick_feed = None
+        self.tick_max_age = 10.0
 
-        self._cache = {}
-        self._cache_time = {}
+        # 数据源健康统计与熔断，决定实际尝试顺序
+        self.source_health = SourceHealthTracker()
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='market-fetch')
+
+        # 按币种缓存价格: coin -> (price_data, fetched_at)，LRU 淘汰
+        self._price_cache = OrderedDict()
+        self._cache_max_coins = cache_max_coins
         self._cache_duration = 180  # Cache for 3 minutes (180 seconds)
+        self._market_cache = OrderedDict()  # 市值/成交量/高低价: coin -> (market_data, fetched_at)
+        # 每个币种最近一次真实有效的价格 (模拟数据和 0 价格不会覆盖)，用于持仓估值
+        self._last_good_prices = {}
+
+        # Stale-while-revalidate: 过期数据先返回，后台单次刷新；并发请求合并为一次抓取
+        self.stale_while_revalidate = stale_while_revalidate
+        self._cache_lock = threading.Lock()
+        self._inflight = {}
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='market-refresh')
+
+        # 流式技术指标: 每个币种维护滚动状态，新价格 O(1) 更新
+        self.indicator_engine = IndicatorEngine()
+
+        # 本地K线存储: 仅增量拉取最后一根K线之后的数据
+        self.candle_store = candle_store
+        self._candle_sync_time = {}
+        self.candle_sync_interval = candle_sync_interval
+        self.indicator_budget = indicator_budget
+        self._history_cache = {}  # 无K线存储时的历史数据: coin -> (history, fetched_at)
+        self._history_pending = {}  # coin -> Future，超出时间预算后仍在后台下载
+        self._history_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='market-history')
+
+        # 本地行情历史: 价格异步批量落库，不阻塞抓取路径
+        self.tick_writer = tick_writer
+
+    @property
+    def binance_symbols(self) -> Dict[str, str]:
+        return self.symbol_registry.binance_symbols
+
+    @property
+    def coingecko_mapping(self) -> Dict[str, str]:
+        return self.symbol_registry.coingecko_mapping
+
+    RECONFIGURABLE = ('data_source_priority', 'disabled_sources', 'source_timeouts', 'fetch_mode',
+                      'hedge_delay', 'consensus_sources', 'consensus_budget', 'outlier_threshold',
+                      'stale_while_revalidate')
+
+    def reconfigure(self, **settings) -> int:
+        """
+        Apply new data source settings in place
+
+        Caches, connection pools, health stats, indicator state and the
+        engines holding this fetcher all stay as they are. Values are
+        validated first and then assigned together under a lock; a fetch
+        already in flight completes, later fetches use the new settings.
+
+        Args:
+            settings: any of RECONFIGURABLE, e.g. data_source_priority=['binance', 'coingecko'],
+                disabled_sources={'528btc'}, source_timeouts={'binance': 3}
+
+        Returns:
+            The new config_version
+        """
+        updates = self.validate_settings(**settings)
+
+        with self._config_lock:
+            for name, value in updates.items():
+                setattr(self, name, value)
+            if 'source_timeouts' in updates:
+                self.odaily_fetcher.timeout = self.source_timeouts['odaily']
+            self.config_version += 1
+            version = self.config_version
+
+        print(f"[INFO] Market data fetcher reconfigured (v{version}): {', '.join(sorted(updates)) or 'no changes'}")
+        return version
+
+    def validate_settings(self, **settings) -> Dict:
+        """
+        Check settings for reconfigure() without applying them
+
+        Returns:
+            The normalized values reconfigure() would assign
+
+        Raises:
+            ValueError: unknown setting or invalid value
+        """
+        unknown = set(settings) - set(self.RECONFIGURABLE)
+        if unknown:
+            raise ValueError(f"Unknown fetcher settings: {', '.join(sorted(unknown))}")
+
+        known_sources = set(self._get_source_methods())
+        updates = {}
+        if 'data_source_priority' in settings:
+            priority = [s for s in settings['data_source_priority'] if s in known_sources]
+            if not priority:
+                raise ValueError("data_source_priority must contain at least one known source")
+            updates['data_source_priority'] = priority
+        if 'disabled_sources' in settings:
+            updates['disabled_sources'] = frozenset(settings['disabled_sources'] or ())
+        if 'source_timeouts' in settings:
+            # 替换整个字典，读取方不会看到一半新一半旧的超时配置
+            updates['source_timeouts'] = dict(self.source_timeouts, **settings['source_timeouts'])
+        if 'fetch_mode' in settings:
+            if settings['fetch_mode'] not in ('sequential', 'hedged', 'consensus'):
+                raise ValueError(f"Unknown fetch_mode: {settings['fetch_mode']}")
+            updates['fetch_mode'] = settings['fetch_mode']
+        for name in ('hedge_delay', 'consensus_sources', 'consensus_budget', 'outlier_threshold',
+                     'stale_while_revalidate'):
+            if name in settings:
+                updates[name] = settings[name]
+
+        priority = updates.get('data_source_priority', self.data_source_priority)
+        disabled = updates.get('disabled_sources', self.disabled_sources)
+        if all(s in disabled for s in priority):
+            raise ValueError("At least one data source must stay enabled")
+        return updates
+
+    def start_tick_feed(self, url: str = None, max_age: float = 10.0) -> BinanceTickFeed:
+        """
+        Start streaming ingestion: a WebSocket ticker client feeding an in-memory tick book
+
+        While ticks are younger than max_age seconds get_current_prices answers
+        from memory; coins without a fresh tick fall back to the polling path.
+
+        Args:
+            url: WebSocket URL (default: Binance miniTicker combined stream;
+                 use tick_replay_server.py's ws://127.0.0.1:8765 offline)
+        """
+        self.stop_tick_feed()
+        self.tick_book = TickBook()
+        self.tick_max_age = max_age
+        self.tick_feed = BinanceTickFeed(self.binance_symbols, tick_book=self.tick_book, url=url,
+                                         on_tick=self._on_stream_tick)
+        self.tick_feed.start()
+        return self.tick_feed
+
+    def _on_stream_tick(self, coin: str, price: float, timestamp: int):
+        """流式报价同步修正已有指标状态的当前K线"""
+        if coin in self.indicator_engine:
+            self.indicator_engine.update(coin, price, timestamp)
+        if self.tick_writer is not None:
+            self.tick_writer.record_tick(coin, price, timestamp, 'stream')
+
+    def _on_symbols_changed(self):
+        """币种注册表变化后让流式行情订阅新的币种列表"""
+        tick_feed = self.tick_feed
+        if tick_feed is not None:
+            tick_feed.set_symbols(self.binance_symbols)
+
+    def stop_tick_feed(self):
+        if self.tick_feed is not None:
+            self.tick_feed.stop()
+        self.tick_feed = None
+        self.tick_book = None
+
+    # ---- 缓存持久化 (热启动) ----
+
+    STATE_VERSION = 1
+
+    def save_state(self, path: str) -> bool:
+        """
+        Write prices, market data, histories, indicator state and candle sync
+        times to a gzip'd JSON file (atomic replace)
+        """
+        with self._cache_lock:
+            price_cache = [[coin, data, ts] for coin, (data, ts) in self._price_cache.items()]
+            market_cache = [[coin, data, ts] for coin, (data, ts) in self._market_cache.items()]
+        state = {
+            'version': self.STATE_VERSION,
+            'saved_at': time.time(),
+            'prices': price_cache,
+            'market_data': market_cache,
+            'histories': [[coin, history, ts] for coin, (history, ts) in list(self._history_cache.items())],
+            'candle_sync_time': dict(self._candle_sync_time),
+            'indicators': self.indicator_engine.export_states(),
+        }
+
+        tmp_path = f"{path}.tmp"
+        try:
+            with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=5) as f:
+                json.dump(state, f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"[ERROR] Failed to save market cache to {path}: {e}")
+            return False
+
+    def load_state(self, path: str, max_age: float = 86400) -> bool:
+        """
+        Restore a saved cache, dropping anything too old to be useful
+
+        Prices are kept while still inside the stale-while-revalidate window
+        (so the first requests are answered instantly and refreshed in the
+        background); histories and candle sync times only if younger than
+        max_age; indicator states only if their last bar is within max_age.
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                state = json.load(f)
+        except Exception as e:
+            print(f"[WARN] Ignoring unreadable market cache {path}: {e}")
+            return False
+        if state.get('version') != self.STATE_VERSION:
+            return False
+
+        now = time.time()
+        price_horizon = now - self._cache_duration - self.stale_while_revalidate
+        with self._cache_lock:
+            for coin, data, ts in state.get('prices', []):
+                if ts >= price_horizon and coin not in self._price_cache:
+                    self._price_cache[coin] = (data, ts)
+                if coin not in self._last_good_prices and is_tradable(data):
+                    self._last_good_prices[coin] = data['price']
+            for coin, data, ts in state.get('market_data', []):
+                if now - ts < self._cache_duration and coin not in self._market_cache:
+                    self._market_cache[coin] = (data, ts)
+
+        for coin, history, ts in state.get('histories', []):
+            if now - ts < max_age:
+                self._history_cache.setdefault(coin, (history, ts))
+        for coin, ts in state.get('candle_sync_time', {}).items():
+            if now - ts < max_age:
+                self._candle_sync_time.setdefault(coin, ts)
+
+        restored = self.indicator_engine.import_states(
+            {coin: packed for coin, packed in state.get('indicators', {}).items()
+             if coin not in self.indicator_engine},
+            min_bucket=int((now - max_age) * 1000)
+        )
+        print(f"[INFO] Market cache restored from {path} (saved {now - state.get('saved_at', now):.0f}s ago): "
+              f"{len(self._price_cache)} prices, {restored} indicator states")
+        return True
+
+    def start_state_persistence(self, path: str, interval: float = 300):
+        """Save the cache every `interval` seconds on a daemon thread (and on close())"""
+        self._state_path = path
+        self._state_stop = threading.Event()
+
+        def loop():
+            while not self._state_stop.wait(interval):
+                self.save_state(path)
+
+        threading.Thread(target=loop, name='market-state', daemon=True).start()
+
+    def close(self):
+        """释放连接池和抓取线程"""
+        if getattr(self, '_state_path', None):
+            self._state_stop.set()
+            self.save_state(self._state_path)
+        self.stop_tick_feed()
+        self._refresh_executor.shutdown(wait=False)
+        self._history_executor.shutdown(wait=False)
+        self._executor.shutdown(wait=False)
+        self.scheduler.close()
+        self.session.close()
 
     def _get_prices_from_odaily(self, coins: List[str]) -> Dict[str, Dict]:
         """Fetch prices from Odaily (可直接获取50个币种)"""
@@ -70,54 +387,15 @@ class MarketDataFetcher:
     def _get_prices_from_528btc(self, coins: List[str]) -> Dict[str, Dict]:
         """Fetch prices from 528btc.com (Primary source - No proxy needed)"""
         try:
-            headers = {
-                'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-                'accept-language': 'zh-CN,zh;q=0.9',
-                'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36'
-            }
-
-            response = requests.get(
+            response = self.session.get(
                 self.btc528_base_url,
-                headers=headers,
-                timeout=10
+                headers=BROWSER_HEADERS,
+                timeout=self.source_timeouts['528btc']
             )
             response.raise_for_status()
 
-            # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            prices = {}
-
-            # Find all walking_item elements
-            for coin in coins:
-                # Look for the coin in the walking items
-                coin_element = soup.find('div', class_='walking_name', string=coin)
-
-                if coin_element:
-                    parent = coin_element.parent
-
-                    # Extract price
-                    price_elem = parent.find('div', class_='walking_price')
-                    if price_elem:
-                        price_text = price_elem.text.strip().replace('$', '').replace(',', '')
-                        try:
-                            price = float(price_text)
-                        except:
-                            continue
-
-                    # Extract change percentage
-                    change_elem = parent.find('div', class_='walking_change')
-                    change_24h = 0.0
-                    if change_elem:
-                        change_text = change_elem.text.strip().replace('%', '')
-                        try:
-                            change_24h = float(change_text)
-                        except:
-                            change_24h = 0.0
-
-                    prices[coin] = {
-                        'price': price,
-                        'change_24h': change_24h
-                    }
+            # 单次遍历解析所有 walking_item，再按币种查表
+            prices = parse_528btc_prices(response.text, coins)
 
             if len(prices) > 0:
                 print(f"[INFO] Successfully fetched {len(prices)} prices from 528btc.com")
@@ -129,43 +407,312 @@ class MarketDataFetcher:
             print(f"[ERROR] 528btc.com failed: {e}")
             return None
 
-    def get_current_prices(self, coins: List[str]) -> Dict[str, float]:
+    def get_current_prices(self, coins: List[str], allow_stale: bool = True) -> Dict[str, float]:
         """
         Get current prices with configurable priority
         Default: Odaily > 528btc.com > Binance > CoinGecko
+
+        In 'hedged' fetch mode the sources overlap instead of running strictly
+        one after another (see _get_prices_hedged).
+
+        Expired entries younger than stale_while_revalidate are returned
+        immediately while one background refresh runs. Concurrent misses for
+        the same coins share a single in-flight fetch.
+
+        Args:
+            allow_stale: False waits for fresh prices (used by the trading cycle)
+        """
+        # 流式行情簿: 新鲜报价直接从内存返回
+        tick_book = self.tick_book
+        if tick_book is not None:
+            streamed = tick_book.get_prices(coins, self.tick_max_age)
+            if len(streamed) == len(coins):
+                return streamed
+        else:
+            streamed = {}
+
+        now = time.time()
+        cached = dict(streamed)
+        stale = []
+        missing = []
+
+        # Check cache (per coin, so any subset is served from a larger fetch)
+        with self._cache_lock:
+            for coin in coins:
+                if coin in streamed:
+                    continue
+                entry = self._price_cache.get(coin)
+                if entry is not None:
+                    self._price_cache.move_to_end(coin)
+                    data, fetched_at = entry
+                    age = now - fetched_at
+                    if age < self._cache_duration:
+                        cached[coin] = data
+                        continue
+                    if allow_stale and age < self._cache_duration + self.stale_while_revalidate:
+                        cached[coin] = data
+                        stale.append(coin)
+                        continue
+                missing.append(coin)
+
+        if stale:
+            self._refresh_prices(stale)
+
+        if missing:
+            fetched = self._refresh_prices(missing).result() or {}
+            for coin in missing:
+                if coin in fetched:
+                    cached[coin] = fetched[coin]
+
+        return {coin: cached[coin] for coin in coins if coin in cached}
+
+    def get_valuation_prices(self, coins: List[str], prices: Dict[str, Dict] = None) -> Dict[str, float]:
+        """
+        {coin: price} for marking positions to market
+
+        Mock and non-positive prices are replaced by the coin's last real
+        price; coins that never had one are left out (get_portfolio then
+        keeps the position at cost instead of valuing it at $0).
+
+        Args:
+            prices: price data already fetched for this purpose (e.g. a snapshot's market state)
         """
-        # Check cache
-        cache_key = 'prices_' + '_'.join(sorted(coins))
-        if cache_key in self._cache:
-            if time.time() - self._cache_time[cache_key] < self._cache_duration:
-                return self._cache[cache_key]
+        if prices is None:
+            prices = self.get_current_prices(coins)
+        valuation = {}
+        for coin in coins:
+            data = prices.get(coin)
+            if data is not None and is_tradable(data):
+                valuation[coin] = data['price']
+            elif coin in self._last_good_prices:
+                valuation[coin] = self._last_good_prices[coin]
+        return valuation
+
+    def _refresh_prices(self, coins: List[str]):
+        """Start (or join) an in-flight fetch covering coins and return its Future"""
+        wanted = set(coins)
+        with self._cache_lock:
+            for key, future in self._inflight.items():
+                if wanted <= set(key):
+                    return future
+
+            key = tuple(sorted(wanted))
+            future = self._refresh_executor.submit(self._fetch_and_cache_prices, key)
+            self._inflight[key] = future
+            return future
+
+    def _fetch_and_cache_prices(self, key: tuple) -> Dict[str, Dict]:
+        try:
+            coins = list(key)
+            fetch_mode = self.fetch_mode
+            if fetch_mode == 'hedged':
+                prices = self._get_prices_hedged(coins)
+            elif fetch_mode == 'consensus':
+                prices = self._get_prices_consensus(coins)
+            else:
+                prices = self._get_prices_sequential(coins)
 
-        # 数据源方法映射
-        source_methods = {
+            # Update cache
+            if prices:
+                self._store_prices(prices)
+                self._update_indicator_ticks(prices)
+                if self.tick_writer is not None:
+                    self.tick_writer.record(prices, source=fetch_mode)
+
+            return prices
+        finally:
+            with self._cache_lock:
+                self._inflight.pop(key, None)
+
+    def _store_prices(self, prices: Dict[str, Dict]):
+        """写入按币种缓存，超出容量时淘汰最久未使用的币种"""
+        now = time.time()
+        with self._cache_lock:
+            for coin, data in prices.items():
+                self._price_cache[coin] = (data, now)
+                self._price_cache.move_to_end(coin)
+                if is_tradable(data):
+                    self._last_good_prices[coin] = data['price']
+            while len(self._price_cache) > self._cache_max_coins:
+                self._price_cache.popitem(last=False)
+
+    def _update_indicator_ticks(self, prices: Dict[str, Dict]):
+        """用实时价格修正已有指标状态的当前K线 (模拟数据不参与)"""
+        now_ms = int(time.time() * 1000)
+        for coin, data in prices.items():
+            if coin in self.indicator_engine and not data.get('is_mock') and data.get('price'):
+                self.indicator_engine.update(coin, data['price'], now_ms)
+
+    def _get_source_methods(self) -> Dict:
+        """数据源方法映射"""
+        return {
             'odaily': self._get_prices_from_odaily,
             '528btc': self._get_prices_from_528btc,
             'binance': self._get_prices_from_binance,
             'coingecko': self._get_prices_from_coingecko
         }
 
+    def _get_effective_priority(self):
+        """
+        按健康状况调整后的数据源顺序
+
+        Returns:
+            (sources, forced): forced 为 True 表示所有数据源均已熔断，按原顺序强制尝试
+        """
+        source_methods = self._get_source_methods()
+        disabled = self.disabled_sources
+        priority = [s for s in self.data_source_priority if s in source_methods and s not in disabled]
+        ordered = self.source_health.order(priority)
+        if ordered:
+            return ordered, False
+        return priority, True
+
+    def _call_source(self, source: str, coins: List[str], force: bool = False) -> Dict[str, Dict]:
+        """调用单个数据源并记录成功率和延迟 (模拟数据视为失败)"""
+        if not self.source_health.begin_request(source) and not force:
+            print(f"[INFO] Skipping data source {source}: circuit open")
+            return None
+
+        start = time.time()
+        prices = None
+        try:
+            prices = self._get_source_methods()[source](coins)
+            return prices
+        finally:
+            success = bool(prices) and not any(data.get('is_mock') for data in prices.values())
+            self.source_health.record(source, success, time.time() - start)
+
+    def get_source_health(self) -> Dict:
+        """数据源健康统计 (成功率、p50/p95 延迟、熔断状态、实际顺序) 及限速队列状态"""
+        stats = self.source_health.stats(self.data_source_priority)
+        stats['scheduler'] = dict(self.scheduler.get_stats(), queue_depth=self.scheduler.queue_depth())
+        return stats
+
+    def _get_prices_sequential(self, coins: List[str]) -> Dict[str, Dict]:
+        """按健康调整后的优先级逐个尝试各个数据源"""
+        sources, forced = self._get_effective_priority()
         prices = None
 
-        # 按优先级尝试各个数据源
-        for source in self.data_source_priority:
-            if source in source_methods:
-                print(f"[INFO] Trying data source: {source}")
-                prices = source_methods[source](coins)
+        for source in sources:
+            print(f"[INFO] Trying data source: {source}")
+            prices = self._call_source(source, coins, force=forced)
+
+            if prices and len(prices) > 0:
+                print(f"[INFO] Successfully fetched prices from {source}")
+                break
+
+        return prices
+
+    def _get_prices_hedged(self, coins: List[str]) -> Dict[str, Dict]:
+        """
+        Hedged fetch across the priority list
+
+        The next source starts when the running ones exceed hedge_delay or
+        fail. The first answer covering every requested coin wins; otherwise
+        the most complete partial answer is returned.
+        """
+        remaining, forced = self._get_effective_priority()
+        pending = {}
+        best = None
+        launch_next = True
+
+        while remaining or pending:
+            if remaining and (launch_next or not pending):
+                source = remaining.pop(0)
+                print(f"[INFO] Hedged fetch: starting {source}")
+                pending[self._executor.submit(self._call_source, source, coins, forced)] = source
+
+            timeout = self.hedge_delay if remaining else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            # 超时未返回，启动下一个数据源
+            launch_next = not done
+
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    prices = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Hedged fetch: {source} raised {e}")
+                    prices = None
+
+                if prices and all(coin in prices for coin in coins):
+                    print(f"[INFO] Successfully fetched prices from {source} (hedged)")
+                    return prices
+
+                if prices and (best is None or len(prices) > len(best)):
+                    best = prices
+
+                # 失败或结果不完整，立即启动下一个数据源
+                launch_next = True
+
+        return best
+
+    def _get_prices_consensus(self, coins: List[str]) -> Dict[str, Dict]:
+        """
+        Consensus fetch: query the top N sources concurrently within a fixed budget
+
+        Quotes are aligned per coin and the median is used as the price.
+        Quotes deviating more than outlier_threshold percent from the median
+        are listed under 'outliers'; other fields come from the first
+        non-outlier source in effective priority order. When no source
+        answers within the budget the first late answer is used unchecked.
+        """
+        sources, forced = self._get_effective_priority()
+        sources = sources[:self.consensus_sources]
+        futures = {self._executor.submit(self._call_source, source, coins, forced): source for source in sources}
+        done, pending = wait(futures, timeout=self.consensus_budget)
+
+        results = {}
+
+        def collect(finished):
+            for future in finished:
+                source = futures[future]
+                try:
+                    prices = future.result()
+                except Exception as e:
+                    print(f"[ERROR] Consensus fetch: {source} raised {e}")
+                    continue
+                if prices and not any(data.get('is_mock') for data in prices.values()):
+                    results[source] = prices
+
+        collect(done)
+
+        # 预算内无任何结果: 等待仍在进行的请求中最先返回的有效结果
+        while not results and pending:
+            print("[WARN] Consensus fetch: no source answered within budget, using first answer")
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+
+        if not results:
+            return self._get_prices_sequential(coins)
+
+        ordered_sources = [s for s in sources if s in results]
+        consensus = {}
+        for coin in coins:
+            quotes = {s: results[s][coin] for s in ordered_sources
+                      if coin in results[s] and results[s][coin].get('price', 0) > 0}
+            if not quotes:
+                continue
+
+            median_price = statistics.median(q['price'] for q in quotes.values())
+            outliers = [s for s, q in quotes.items()
+                        if abs(q['price'] - median_price) / median_price * 100 > self.outlier_threshold]
+            agreeing = [s for s in quotes if s not in outliers] or list(quotes)
 
-                if prices and len(prices) > 0:
-                    print(f"[INFO] Successfully fetched prices from {source}")
-                    break
+            data = dict(quotes[agreeing[0]])
+            data['price'] = median_price
+            data['change_24h'] = statistics.median(quotes[s].get('change_24h', 0) for s in agreeing)
+            data['sources'] = list(quotes)
+            data['outliers'] = outliers
+            consensus[coin] = data
 
-        # Update cache
-        if prices:
-            self._cache[cache_key] = prices
-            self._cache_time[cache_key] = time.time()
+            if outliers:
+                detail = ', '.join(f"{s}={quotes[s]['price']}" for s in outliers)
+                print(f"[WARN] Consensus {coin}: median {median_price} outliers {detail}")
 
-        return prices if prices else {}
+        print(f"[INFO] Consensus prices for {len(consensus)} coins from {len(results)} sources")
+        return consensus
 
     def _get_prices_from_binance(self, coins: List[str]) -> Dict[str, Dict]:
         """Get current prices from Binance API"""
@@ -173,31 +720,16 @@ class MarketDataFetcher:
 
         try:
             # Batch fetch Binance 24h ticker data
-            symbols = [self.binance_symbols.get(coin) for coin in coins if coin in self.binance_symbols]
+            coin_by_symbol, batches = binance_ticker_requests(coins, self.binance_symbols, self.BINANCE_BATCH_SIZE)
 
-            if symbols:
-                # Build symbols parameter
-                symbols_param = '[' + ','.join([f'"{s}"' for s in symbols]) + ']'
-
-                response = requests.get(
+            for params in batches:
+                response = self.session.get(
                     f"{self.binance_base_url}/ticker/24hr",
-                    params={'symbols': symbols_param},
-                    timeout=5
+                    params=params,
+                    timeout=self.source_timeouts['binance']
                 )
                 response.raise_for_status()
-                data = response.json()
-
-                # Parse data
-                for item in data:
-                    symbol = item['symbol']
-                    # Find corresponding coin
-                    for coin, binance_symbol in self.binance_symbols.items():
-                        if binance_symbol == symbol:
-                            prices[coin] = {
-                                'price': float(item['lastPrice']),
-                                'change_24h': float(item['priceChangePercent'])
-                            }
-                            break
+                prices.update(parse_binance_tickers(response.json(), coin_by_symbol))
 
             if len(prices) > 0:
                 print(f"[INFO] Successfully fetched {len(prices)} prices from Binance")
@@ -210,28 +742,19 @@ class MarketDataFetcher:
     def _get_prices_from_coingecko(self, coins: List[str]) -> Dict[str, float]:
         """Fallback: Fetch prices from CoinGecko"""
         try:
-            coin_ids = [self.coingecko_mapping.get(coin, coin.lower()) for coin in coins]
-
-            response = requests.get(
-                f"{self.coingecko_base_url}/simple/price",
-                params={
-                    'ids': ','.join(coin_ids),
-                    'vs_currencies': 'usd',
-                    'include_24hr_change': 'true'
-                },
-                timeout=10
-            )
-            response.raise_for_status()
-            data = response.json()
+            coin_by_id, batches = coingecko_price_requests(coins, self.coingecko_mapping, self.COINGECKO_BATCH_SIZE)
 
             prices = {}
-            for coin in coins:
-                coin_id = self.coingecko_mapping.get(coin, coin.lower())
-                if coin_id in data:
-                    prices[coin] = {
-                        'price': data[coin_id]['usd'],
-                        'change_24h': data[coin_id].get('usd_24h_change', 0)
-                    }
+            for params in batches:
+                response = self.scheduler.get(
+                    f"{self.coingecko_base_url}/simple/price",
+                    params=params,
+                    timeout=self.source_timeouts['coingecko'],
+                    priority=PRIORITY_PRICE,
+                    max_wait=self.source_timeouts['coingecko']
+                )
+                response.raise_for_status()
+                prices.update(parse_coingecko_prices(response.json(), coin_by_id))
 
             if len(prices) > 0:
                 print(f"[INFO] Successfully fetched {len(prices)} prices from CoinGecko")
@@ -242,92 +765,307 @@ class MarketDataFetcher:
             return self._get_mock_prices(coins)
     
     def get_market_data(self, coin: str) -> Dict:
-        """Get detailed market data from CoinGecko"""
-        coin_id = self.coingecko_mapping.get(coin, coin.lower())
-        
+        """Get detailed market data from CoinGecko (served from the bulk listing cache)"""
+        return self.get_market_data_bulk([coin]).get(coin, {})
+
+    def get_market_data_bulk(self, coins: List[str]) -> Dict[str, Dict]:
+        """
+        Market data for many coins from CoinGecko's /coins/markets listing
+
+        One request covers up to 250 coins and only the seven fields used
+        downstream are kept. Results are cached per coin with the same
+        duration and LRU bound as prices, so repeated calls for any subset
+        cost nothing until they expire.
+        """
+        now = time.time()
+        results = {}
+        missing = []
+        with self._cache_lock:
+            for coin in coins:
+                entry = self._market_cache.get(coin)
+                if entry is not None and now - entry[1] < self._cache_duration:
+                    self._market_cache.move_to_end(coin)
+                    results[coin] = entry[0]
+                else:
+                    missing.append(coin)
+
+        for start in range(0, len(missing), self.MARKETS_PAGE_SIZE):
+            chunk = missing[start:start + self.MARKETS_PAGE_SIZE]
+            fetched = self._fetch_markets(chunk)
+            if fetched:
+                self._store_market_data(fetched)
+                results.update(fetched)
+
+        return {coin: results[coin] for coin in coins if coin in results}
+
+    def _fetch_markets(self, coins: List[str]) -> Dict[str, Dict]:
+        coin_by_id = {self.coingecko_mapping.get(coin, coin.lower()): coin for coin in coins}
         try:
-            response = requests.get(
-                f"{self.coingecko_base_url}/coins/{coin_id}",
-                params={'localization': 'false', 'tickers': 'false', 'community_data': 'false'},
-                timeout=10
+            response = self.scheduler.get(
+                f"{self.coingecko_base_url}/coins/markets",
+                params={
+                    'vs_currency': 'usd',
+                    'ids': ','.join(coin_by_id),
+                    'per_page': self.MARKETS_PAGE_SIZE,
+                    'price_change_percentage': '7d'
+                },
+                timeout=self.source_timeouts['coingecko'],
+                priority=PRIORITY_MARKET
             )
             response.raise_for_status()
             data = response.json()
-            
-            market_data = data.get('market_data', {})
-            
-            return {
-                'current_price': market_data.get('current_price', {}).get('usd', 0),
-                'market_cap': market_data.get('market_cap', {}).get('usd', 0),
-                'total_volume': market_data.get('total_volume', {}).get('usd', 0),
-                'price_change_24h': market_data.get('price_change_percentage_24h', 0),
-                'price_change_7d': market_data.get('price_change_percentage_7d', 0),
-                'high_24h': market_data.get('high_24h', {}).get('usd', 0),
-                'low_24h': market_data.get('low_24h', {}).get('usd', 0),
-            }
         except Exception as e:
-            print(f"[ERROR] Failed to get market data for {coin}: {e}")
+            print(f"[ERROR] Failed to get bulk market data for {len(coins)} coins: {e}")
             return {}
-    
+
+        market_data = {}
+        for item in data:
+            coin = coin_by_id.get(item.get('id'))
+            if coin:
+                market_data[coin] = {
+                    'current_price': item.get('current_price') or 0,
+                    'market_cap': item.get('market_cap') or 0,
+                    'total_volume': item.get('total_volume') or 0,
+                    'price_change_24h': item.get('price_change_percentage_24h') or 0,
+                    'price_change_7d': item.get('price_change_percentage_7d_in_currency') or 0,
+                    'high_24h': item.get('high_24h') or 0,
+                    'low_24h': item.get('low_24h') or 0,
+                }
+        return market_data
+
+    def _store_market_data(self, market_data: Dict[str, Dict]):
+        now = time.time()
+        with self._cache_lock:
+            for coin, data in market_data.items():
+                self._market_cache[coin] = (data, now)
+                self._market_cache.move_to_end(coin)
+            while len(self._market_cache) > self._cache_max_coins:
+                self._market_cache.popitem(last=False)
+
     def get_historical_prices(self, coin: str, days: int = 7) -> List[Dict]:
         """Get historical prices from CoinGecko"""
         coin_id = self.coingecko_mapping.get(coin, coin.lower())
         
         try:
-            response = requests.get(
+            response = self.scheduler.get(
                 f"{self.coingecko_base_url}/coins/{coin_id}/market_chart",
                 params={'vs_currency': 'usd', 'days': days},
-                timeout=10
+                timeout=self.source_timeouts['coingecko'],
+                priority=PRIORITY_HISTORY
             )
             response.raise_for_status()
-            data = response.json()
-            
-            prices = []
-            for price_data in data.get('prices', []):
-                prices.append({
-                    'timestamp': price_data[0],
-                    'price': price_data[1]
-                })
-            
-            return prices
+            return parse_coingecko_history(response.json())
         except Exception as e:
             print(f"[ERROR] Failed to get historical prices for {coin}: {e}")
             return []
     
-    def calculate_technical_indicators(self, coin: str) -> Dict:
-        """Calculate technical indicators"""
-        historical = self.get_historical_prices(coin, days=14)
-        
-        if not historical or len(historical) < 14:
-            return {}
-        
-        prices = [p['price'] for p in historical]
-        
-        # Simple Moving Average
-        sma_7 = sum(prices[-7:]) / 7 if len(prices) >= 7 else prices[-1]
-        sma_14 = sum(prices[-14:]) / 14 if len(prices) >= 14 else prices[-1]
-        
-        # Simple RSI calculation
-        changes = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        gains = [c if c > 0 else 0 for c in changes]
-        losses = [-c if c < 0 else 0 for c in changes]
-        
-        avg_gain = sum(gains[-14:]) / 14 if gains else 0
-        avg_loss = sum(losses[-14:]) / 14 if losses else 0
-        
-        if avg_loss == 0:
-            rsi = 100
+    def sync_candles(self, coin: str, days: int = 14, interval: str = '1h') -> int:
+        """
+        Incrementally sync hourly candles for a coin into the candle store
+
+        Only points from the newest stored candle onward are downloaded (the
+        newest candle is refetched so a partial hour gets completed).
+        CoinGecko's price points are bucketed into candles by open time;
+        volume is the rolling 24h volume at the candle's last point.
+
+        Returns:
+            Number of candles written
+        """
+        if not self.candle_store:
+            return 0
+
+        now = time.time()
+        if not self._candle_sync_due(coin, now):
+            return 0
+
+        interval_ms = 3600 * 1000
+        now_ms = int(now * 1000)
+        window_start = now_ms - days * 86400 * 1000
+        last_time = self.candle_store.get_last_candle_time(coin, interval)
+        from_ms = max(last_time, window_start) if last_time else window_start
+
+        coin_id = self.coingecko_mapping.get(coin, coin.lower())
+        try:
+            response = self.scheduler.get(
+                f"{self.coingecko_base_url}/coins/{coin_id}/market_chart/range",
+                params={'vs_currency': 'usd', 'from': from_ms // 1000, 'to': now_ms // 1000},
+                timeout=self.source_timeouts['coingecko'],
+                priority=PRIORITY_HISTORY
+            )
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            print(f"[ERROR] Failed to sync candles for {coin}: {e}")
+            return 0
+
+        volumes = {int(ts): vol for ts, vol in data.get('total_volumes', [])}
+
+        buckets = {}
+        for ts, price in data.get('prices', []):
+            ts = int(ts)
+            open_time = ts - ts % interval_ms
+            candle = buckets.get(open_time)
+            if candle is None:
+                buckets[open_time] = [open_time, price, price, price, price, volumes.get(ts, 0)]
+            else:
+                candle[2] = max(candle[2], price)
+                candle[3] = min(candle[3], price)
+                candle[4] = price
+                candle[5] = volumes.get(ts, candle[5])
+
+        candles = [tuple(buckets[t]) for t in sorted(buckets)]
+        self.candle_store.upsert_candles(coin, interval, candles)
+        self._candle_sync_time[coin] = now
+        return len(candles)
+
+    def get_local_history(self, coin: str, interval: str = '1h', since: int = None,
+                          limit: int = None) -> List[Dict]:
+        """
+        Bars from the local candle store at any stored resolution
+
+        '1m', '5m' and '1h_tick' bars come from rolled-up market ticks; '1h'
+        is the CoinGecko sync with '1h_tick' rollups filling the hours it has
+        not covered. No network access.
+        """
+        if not self.candle_store:
+            return []
+        candles = self.candle_store.get_candles(coin, interval, since=since, limit=limit)
+        fallback = ROLLUP_FALLBACK.get(interval)
+        if fallback:
+            rolled = self.candle_store.get_candles(coin, fallback, since=since, limit=limit)
+            candles = fill_candle_gaps(candles, rolled)
+            if limit:
+                candles = candles[-limit:]
+        return candles
+
+    def _candle_sync_due(self, coin: str, now: float = None) -> bool:
+        now = now or time.time()
+        return now - self._candle_sync_time.get(coin, 0) >= self.candle_sync_interval
+
+    def _get_cached_history(self, coin: str, days: int = 14) -> List[Dict]:
+        """CoinGecko history, reused for candle_sync_interval (no candle store configured)"""
+        entry = self._history_cache.get(coin)
+        if entry is not None and time.time() - entry[1] < self.candle_sync_interval:
+            return entry[0]
+        history = self.get_historical_prices(coin, days=days)
+        if history:
+            self._history_cache[coin] = (history, time.time())
+        return history
+
+    def _history_done(self, coin: str, future):
+        if self._history_pending.get(coin) is future:
+            self._history_pending.pop(coin, None)
+
+    def _load_indicator_histories(self, coins: List[str], days: int = 14, budget: float = None,
+                                  full: bool = True) -> Dict[str, List[Dict]]:
+        """
+        Histories for many coins within a time budget
+
+        Downloads that are due run concurrently (the scheduler still enforces
+        CoinGecko's rate limit); whatever has not finished after `budget`
+        seconds keeps running in the background and is picked up next cycle,
+        so a large or cold universe cannot stall the trading cycle. With a
+        candle store all coins are then read back in one bulk query; with
+        full=False only bars from the oldest streaming state onward are read.
+        """
+        budget = self.indicator_budget if budget is None else budget
+        now = time.time()
+
+        if self.candle_store:
+            due = [coin for coin in coins if self._candle_sync_due(coin, now)]
+            task, task_args = self.sync_candles, {'days': days}
         else:
-            rs = avg_gain / avg_loss
-            rsi = 100 - (100 / (1 + rs))
-        
-        return {
-            'sma_7': sma_7,
-            'sma_14': sma_14,
-            'rsi_14': rsi,
-            'current_price': prices[-1],
-            'price_change_7d': ((prices[-1] - prices[0]) / prices[0]) * 100 if prices[0] > 0 else 0
-        }
+            due = [coin for coin in coins
+                   if coin not in self._history_cache or now - self._history_cache[coin][1] >= self.candle_sync_interval]
+            task, task_args = self._get_cached_history, {'days': days}
+
+        futures = []
+        for coin in due:
+            future = self._history_pending.get(coin)
+            if future is None or future.done():
+                future = self._history_executor.submit(task, coin, **task_args)
+                future.add_done_callback(lambda f, c=coin: self._history_done(c, f))
+                self._history_pending[coin] = future
+            futures.append(future)
+
+        if futures:
+            _, not_done = wait(futures, timeout=budget)
+            if not_done:
+                print(f"[WARN] History for {len(not_done)}/{len(futures)} coins still downloading after "
+                      f"{budget:g}s, continuing in background")
+
+        if self.candle_store:
+            since = int((time.time() - days * 86400) * 1000)
+            if not full:
+                seeded = [self.indicator_engine.last_bucket(coin) for coin in coins]
+                if all(bucket is not None for bucket in seeded):
+                    since = max(since, min(seeded))
+            synced = self.candle_store.get_candles_bulk(coins, '1h', since=since)
+            # 本地行情汇总的小时线补齐同步未覆盖的小时 (同步失败或尚未完成时也有历史)
+            rolled = self.candle_store.get_candles_bulk(coins, ROLLUP_FALLBACK['1h'], since=since)
+            candles = {coin: fill_candle_gaps(synced.get(coin), rolled.get(coin)) for coin in coins}
+            # 带上K线高低价，批量 ATR 使用真实波幅
+            return {coin: [{'timestamp': c['open_time'], 'price': c['close'], 'high': c['high'], 'low': c['low']}
+                           for c in rows]
+                    for coin, rows in candles.items() if rows}
+
+        return {coin: self._history_cache[coin][0] for coin in coins if coin in self._history_cache}
+
+    def calculate_indicator_batch(self, price_matrix, coins: List[str], high=None, low=None):
+        """
+        Vectorized indicator set for a (coins x time) price matrix
+
+        Computes SMA, EMA, RSI, MACD, Bollinger bands, ATR and realized
+        volatility for every row at once (requires numpy).
+
+        Returns:
+            IndicatorBatch: compact per-indicator arrays, or None without numpy
+        """
+        if not HAS_NUMPY:
+            return None
+        return IndicatorBatch(coins, compute_indicator_batch(price_matrix, high=high, low=low))
+
+    def calculate_technical_indicators(self, coin: str) -> Dict:
+        """Calculate technical indicators for one coin (same path as calculate_indicators_for_coins)"""
+        return self.calculate_indicators_for_coins([coin])[coin]
+
+    def calculate_indicators_for_coins(self, coins: List[str]) -> Dict[str, Dict]:
+        """
+        Indicators for many coins with bounded history loading
+
+        Histories come from _load_indicator_histories (concurrent, time
+        budgeted, one bulk read from the candle store, hourly tick rollups
+        filling hours the sync has not covered). Streaming indicators
+        are updated per coin; when numpy is available the extended batch set
+        (MACD, Bollinger, ATR, volatility) is merged in.
+        """
+        # 批量指标需要完整历史；否则只读取流式状态之后的新K线
+        loaded = self._load_indicator_histories(coins, days=14, full=HAS_NUMPY)
+        histories = {}
+        highs = {}
+        lows = {}
+        results = {}
+        for coin in coins:
+            historical = loaded.get(coin)
+            if historical:
+                self.indicator_engine.update_history(coin, historical)
+                histories[coin] = [p['price'] for p in historical]
+                if 'high' in historical[0]:
+                    highs[coin] = [p['high'] for p in historical]
+                    lows[coin] = [p['low'] for p in historical]
+            results[coin] = self.indicator_engine.snapshot(coin)
+
+        if HAS_NUMPY and histories:
+            # 按历史长度分组计算，每个币种保留完整序列
+            for batch_coins, matrix, high, low in build_price_matrices(histories, min_points=35,
+                                                                       highs=highs, lows=lows):
+                batch = self.calculate_indicator_batch(matrix, batch_coins, high=high, low=low)
+                for coin in batch_coins:
+                    if results[coin]:
+                        for name, value in batch.for_coin(coin).items():
+                            results[coin].setdefault(name, value)
+
+        return results
 
     def _get_mock_prices(self, coins: List[str]) -> Dict[str, Dict]:
         """返回模拟市场数据，确保页面正常显示"""
@@ -361,10 +1099,11 @@ class MarketDataFetcher:
 
                 mock_prices[coin] = {
                     'price': round(current_price, 2 if current_price > 1 else 4),
-                    'change_24h': round(change_24h, 2)
+                    'change_24h': round(change_24h, 2),
+                    'is_mock': True
                 }
             else:
-                mock_prices[coin] = {'price': 0, 'change_24h': 0}
+                mock_prices[coin] = {'price': 0, 'change_24h': 0, 'is_mock': True}
 
         print(f"[INFO] Using mock market data for {len(coins)} coins")
         return mock_prices
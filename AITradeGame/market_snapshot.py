@@ -0,0 +1,125 @@
+"""
+Market snapshot module - One shared market state per trading cycle
+"""
+import threading
+import time
+from types import MappingProxyType
+from typing import Dict, List, Optional
+
+
+def is_tradable(price_data: Dict) -> bool:
+    """Real, positive price (mock fallbacks and zero prices are never traded on)"""
+    price = price_data.get('price')
+    return not price_data.get('is_mock') and isinstance(price, (int, float)) and price > 0
+
+
+class MarketSnapshot:
+    """Immutable, versioned market state (prices + indicators) shared by all engines"""
+
+    def __init__(self, version: int, coins: List[str], market_state: Dict):
+        self.version = version
+        self.created_at = time.time()
+        self.coins = tuple(coins)
+        # 冻结每个币种的数据，防止某个引擎修改后影响其他引擎
+        self._state = MappingProxyType({
+            coin: MappingProxyType({
+                **data,
+                'indicators': MappingProxyType(dict(data.get('indicators') or {}))
+            })
+            for coin, data in market_state.items()
+        })
+
+    @property
+    def prices(self) -> Dict[str, float]:
+        """Plain {coin: price} map, as used by Database.get_portfolio"""
+        return {coin: data['price'] for coin, data in self._state.items()}
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.created_at
+
+    def get_market_state(self, coins: Optional[List[str]] = None) -> Dict:
+        """
+        Return a private copy of the market state for the given coins
+
+        Engines receive their own dicts so the shared snapshot never changes.
+        """
+        coins = coins if coins is not None else self.coins
+        market_state = {}
+        for coin in coins:
+            if coin in self._state:
+                data = dict(self._state[coin])
+                data['indicators'] = dict(data['indicators'])
+                market_state[coin] = data
+        return market_state
+
+    def __contains__(self, coin: str) -> bool:
+        return coin in self._state
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def __repr__(self) -> str:
+        return f"MarketSnapshot(version={self.version}, coins={len(self._state)})"
+
+
+class MarketSnapshotService:
+    """Build one market snapshot per cycle and hand the same object to every engine"""
+
+    def __init__(self, market_fetcher, coins: List[str] = None, symbol_registry=None):
+        """
+        Args:
+            coins: 固定币种列表；为空时每次构建快照从 symbol_registry 读取当前币种
+        """
+        self.market_fetcher = market_fetcher
+        self._coins = list(coins) if coins is not None else None
+        self.symbol_registry = symbol_registry
+        self._lock = threading.RLock()
+        self._version = 0
+        self._current = None
+
+    @property
+    def coins(self) -> List[str]:
+        if self._coins is not None:
+            return self._coins
+        registry = self.symbol_registry if self.symbol_registry is not None else self.market_fetcher.symbol_registry
+        return registry.coins()
+
+    @property
+    def current(self) -> Optional[MarketSnapshot]:
+        return self._current
+
+    def build_snapshot(self) -> MarketSnapshot:
+        """Fetch prices and indicators once and publish a new snapshot version"""
+        with self._lock:
+            start = time.time()
+            universe = self.coins
+            # 交易决策不使用过期价格
+            prices = self.market_fetcher.get_current_prices(universe, allow_stale=False)
+            # 模拟价格 (所有数据源失败时的兜底) 和非正价格不能进入交易快照
+            coins = [coin for coin in universe if coin in prices and is_tradable(prices[coin])]
+            skipped = len([coin for coin in universe if coin in prices]) - len(coins)
+            if skipped:
+                print(f"[WARN] Snapshot skipped {skipped} coin(s) with mock or non-positive prices")
+            indicators = self.market_fetcher.calculate_indicators_for_coins(coins)
+
+            market_state = {}
+            for coin in coins:
+                market_state[coin] = prices[coin].copy()
+                market_state[coin]['indicators'] = indicators.get(coin, {})
+
+            self._version += 1
+            snapshot = MarketSnapshot(self._version, universe, market_state)
+            self._current = snapshot
+
+            print(f"[INFO] Market snapshot v{snapshot.version} built: "
+                  f"{len(snapshot)} coins in {time.time() - start:.2f}s")
+            return snapshot
+
+    def get_snapshot(self, max_age: float = None) -> MarketSnapshot:
+        """Return the current snapshot, rebuilding it if missing or older than max_age"""
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None or (max_age is not None and snapshot.age > max_age):
+                snapshot = self.build_snapshot()
+            return snapshot
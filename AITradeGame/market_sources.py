@@ -0,0 +1,101 @@
+"""
+Market sources module - Request building and response parsing shared by the threaded and async fetchers
+
+Each source is split into pure functions: *_requests() builds the query
+parameters (batched) plus the lookup from the source's ids back to coins,
+and parse_*() turns one decoded response into the unified
+{coin: {'price': ..., 'change_24h': ...}} format. MarketDataFetcher and
+AsyncMarketDataFetcher only add transport, so a parser fix is made once.
+Odaily's table parsing lives in odaily_fetcher (parse_market_data,
+build_market_index, prices_from_index).
+"""
+from typing import Dict, List, Tuple
+
+from btc528_parser import parse_walking_items
+
+BTC528_URL = "https://www.528btc.com"
+BINANCE_BASE_URL = "https://api.binance.com/api/v3"
+COINGECKO_BASE_URL = "https://api.coingecko.com/api/v3"
+
+BINANCE_BATCH_SIZE = 100  # 每次 ticker/24hr 请求的交易对数量
+COINGECKO_BATCH_SIZE = 250  # 每次 simple/price 请求的币种数量
+
+BROWSER_HEADERS = {
+    'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'accept-language': 'zh-CN,zh;q=0.9',
+    'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36'
+}
+
+
+# ---- 528btc ----
+
+def parse_528btc_prices(html: str, coins: List[str]) -> Dict[str, Dict]:
+    """首页滚动行情 HTML -> 指定币种价格 (单次遍历后查表)"""
+    tickers = parse_walking_items(html)
+    prices = {}
+    for coin in coins:
+        if coin in tickers:
+            price, change_24h = tickers[coin]
+            prices[coin] = {'price': price, 'change_24h': change_24h}
+    return prices
+
+
+# ---- Binance ----
+
+def binance_ticker_requests(coins: List[str], binance_symbols: Dict[str, str],
+                            batch_size: int = BINANCE_BATCH_SIZE) -> Tuple[Dict[str, str], List[Dict]]:
+    """
+    Returns:
+        ({交易对: 币种}, [ticker/24hr 请求参数, ...])，没有交易对的币种不请求
+    """
+    coin_by_symbol = {binance_symbols[coin]: coin for coin in coins if coin in binance_symbols}
+    symbols = list(coin_by_symbol)
+    params = [{'symbols': '[' + ','.join(f'"{s}"' for s in symbols[start:start + batch_size]) + ']'}
+              for start in range(0, len(symbols), batch_size)]
+    return coin_by_symbol, params
+
+
+def parse_binance_tickers(data: List[Dict], coin_by_symbol: Dict[str, str]) -> Dict[str, Dict]:
+    prices = {}
+    for item in data:
+        coin = coin_by_symbol.get(item['symbol'])
+        if coin:
+            prices[coin] = {
+                'price': float(item['lastPrice']),
+                'change_24h': float(item['priceChangePercent'])
+            }
+    return prices
+
+
+# ---- CoinGecko ----
+
+def coingecko_price_requests(coins: List[str], mapping: Dict[str, str],
+                             batch_size: int = COINGECKO_BATCH_SIZE) -> Tuple[Dict[str, str], List[Dict]]:
+    """
+    Returns:
+        ({CoinGecko ID: 币种}, [simple/price 请求参数, ...])；未映射的币种用小写符号作 ID
+    """
+    coin_by_id = {mapping.get(coin, coin.lower()): coin for coin in coins}
+    coin_ids = list(coin_by_id)
+    params = [{'ids': ','.join(coin_ids[start:start + batch_size]),
+               'vs_currencies': 'usd',
+               'include_24hr_change': 'true'}
+              for start in range(0, len(coin_ids), batch_size)]
+    return coin_by_id, params
+
+
+def parse_coingecko_prices(data: Dict, coin_by_id: Dict[str, str]) -> Dict[str, Dict]:
+    prices = {}
+    for coin_id, item in data.items():
+        coin = coin_by_id.get(coin_id)
+        if coin and 'usd' in item:
+            prices[coin] = {
+                'price': item['usd'],
+                'change_24h': item.get('usd_24h_change', 0)
+            }
+    return prices
+
+
+def parse_coingecko_history(data: Dict) -> List[Dict]:
+    """market_chart 响应 -> [{'timestamp': 毫秒, 'price': 价格}, ...]"""
+    return [{'timestamp': ts, 'price': price} for ts, price in data.get('prices', [])]
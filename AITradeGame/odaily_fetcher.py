@@ -5,30 +5,138 @@ Odaily星球日报加密货币市场数据获取模块
 功能：获取全部币种的交易对、最新价、涨跌幅、最高价、最低价、24H成交额、市值等信息
 """
 
+import re
 import requests
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 from typing import Dict, List
+from http_session import create_session
+
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+# 表格列顺序: 排名, 交易对, 最新价, 涨跌幅, 最高价, 最低价, 24H成交额, 市值
+MARKET_COLUMNS = ('rank', 'trading_pair', 'latest_price', 'change_24h',
+                  'high_price', 'low_price', 'volume_24h', 'market_cap')
+
+_SYMBOL_RE = re.compile(r'[A-Z0-9]+')
+
+ODAILY_URL = 'https://www.odaily.news/zh-CN/market'
+ODAILY_HEADERS = {
+    'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'accept-language': 'zh-CN,zh;q=0.9',
+    'cache-control': 'max-age=0',
+    'sec-ch-ua': '"Google Chrome";v="141", "Not?A_Brand";v="8", "Chromium";v="141"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"macOS"',
+    'sec-fetch-dest': 'document',
+    'sec-fetch-mode': 'navigate',
+    'sec-fetch-site': 'same-origin',
+    'sec-fetch-user': '?1',
+    'upgrade-insecure-requests': '1',
+    'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36'
+}
+
+
+class _TbodyRowParser(HTMLParser):
+    """流式解析 <tbody> 片段，只收集每行单元格文本"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag in ('td', 'th') and self._cell is not None:
+            self._row.append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _extract_first_tbody(html: str) -> str:
+    """截取第一个 <table> 内的 <tbody> 片段，避免解析整个页面"""
+    table_start = html.find('<table')
+    if table_start < 0:
+        return ''
+    table_end = html.find('</table>', table_start)
+    if table_end < 0:
+        table_end = len(html)
+
+    tbody_start = html.find('<tbody', table_start, table_end)
+    if tbody_start < 0:
+        return ''
+    tbody_end = html.find('</tbody>', tbody_start, table_end)
+    if tbody_end < 0:
+        tbody_end = table_end
+    return html[tbody_start:tbody_end + len('</tbody>')]
+
+
+def parse_market_rows(html: str) -> List[List[str]]:
+    """
+    解析 Odaily 行情页第一个表格的数据行
+
+    优先使用 lxml (C 实现)，未安装时回退到标准库流式 tokenizer。
+
+    Returns:
+        List[List[str]]: 每行的单元格文本
+    """
+    fragment = _extract_first_tbody(html)
+    if not fragment:
+        return []
+
+    if HAS_LXML:
+        tbody = lxml.html.fragment_fromstring(fragment)
+        return [
+            [cell.text_content().strip() for cell in tr.xpath('./td|./th')]
+            for tr in tbody.iter('tr')
+        ]
+
+    parser = _TbodyRowParser()
+    parser.feed(fragment)
+    parser.close()
+    return parser.rows
+
+
+def base_symbol(trading_pair: str) -> str:
+    """交易对转基础币种，例如 'BTC/USDT' -> 'BTC', 'ETHUSDT' -> 'ETH'"""
+    match = _SYMBOL_RE.match(trading_pair.strip().upper())
+    if not match:
+        return ''
+    symbol = match.group(0)
+    if symbol.endswith('USDT') and len(symbol) > 4:
+        symbol = symbol[:-4]
+    return symbol
 
 
 class OdailyFetcher:
     """Odaily市场数据获取器"""
 
-    def __init__(self):
-        self.base_url = 'https://www.odaily.news/zh-CN/market'
-        self.headers = {
-            'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-            'accept-language': 'zh-CN,zh;q=0.9',
-            'cache-control': 'max-age=0',
-            'sec-ch-ua': '"Google Chrome";v="141", "Not?A_Brand";v="8", "Chromium";v="141"',
-            'sec-ch-ua-mobile': '?0',
-            'sec-ch-ua-platform': '"macOS"',
-            'sec-fetch-dest': 'document',
-            'sec-fetch-mode': 'navigate',
-            'sec-fetch-site': 'same-origin',
-            'sec-fetch-user': '?1',
-            'upgrade-insecure-requests': '1',
-            'user-agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/141.0.0.0 Safari/537.36'
-        }
+    def __init__(self, session: requests.Session = None, timeout: float = 15):
+        """
+        Args:
+            session: 共享的连接池会话 (由 MarketDataFetcher 传入)，为空时自建
+            timeout: 请求超时 (秒)
+        """
+        self.session = session or create_session()
+        self.timeout = timeout
+        self.base_url = ODAILY_URL
+        self.headers = dict(ODAILY_HEADERS)
 
     def get_crypto_market_data(self) -> List[Dict[str, str]]:
         """
@@ -38,58 +146,12 @@ class OdailyFetcher:
             List[Dict]: 包含币种市场信息的列表
         """
         try:
-            response = requests.get(self.base_url, headers=self.headers, timeout=15)
+            response = self.session.get(self.base_url, headers=self.headers, timeout=self.timeout)
             response.raise_for_status()
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 查找主要的市场数据表格（第一个表格包含完整的市场数据）
-            tables = soup.find_all('table')
-            if not tables:
-                print("[ERROR] Odaily: 未找到数据表格")
-                return []
-
-            main_table = tables[0]  # 使用第一个表格，它包含主要市场数据
-
-            # 查找表格数据行
-            tbody = main_table.find('tbody')
-            if not tbody:
+            crypto_data = parse_market_data(response.text)
+            if not crypto_data:
                 print("[ERROR] Odaily: 未找到表格数据")
-                return []
-
-            rows = tbody.find_all('tr')
-            crypto_data = []
-
-            for row in rows:
-                cells = row.find_all(['td', 'th'])
-                if len(cells) >= 8:  # 确保有足够的列
-                    row_data = {}
-
-                    # 提取每一列的数据
-                    for i, cell in enumerate(cells):
-                        cell_text = cell.get_text().strip()
-
-                        if i == 0:  # 排名
-                            row_data['rank'] = cell_text
-                        elif i == 1:  # 交易对
-                            row_data['trading_pair'] = cell_text
-                        elif i == 2:  # 最新价
-                            row_data['latest_price'] = cell_text
-                        elif i == 3:  # 涨跌幅
-                            row_data['change_24h'] = cell_text
-                        elif i == 4:  # 最高价
-                            row_data['high_price'] = cell_text
-                        elif i == 5:  # 最低价
-                            row_data['low_price'] = cell_text
-                        elif i == 6:  # 24H成交额
-                            row_data['volume_24h'] = cell_text
-                        elif i == 7:  # 市值
-                            row_data['market_cap'] = cell_text
-
-                    # 只添加有效数据的行
-                    if row_data.get('trading_pair') and row_data.get('latest_price'):
-                        crypto_data.append(row_data)
-
             return crypto_data
 
         except requests.RequestException as e:
@@ -99,6 +161,15 @@ class OdailyFetcher:
             print(f"[ERROR] Odaily数据解析错误: {e}")
             return []
 
+    def get_market_index(self) -> Dict[str, Dict[str, str]]:
+        """
+        获取以基础币种为键的市场数据索引
+
+        Returns:
+            Dict: {'BTC': row_data, ...}，同一币种有多个交易对时保留表格中的第一个
+        """
+        return build_market_index(self.get_crypto_market_data())
+
     def get_prices_for_coins(self, coins: List[str]) -> Dict[str, Dict]:
         """
         获取指定币种的价格信息（格式化为统一接口）
@@ -110,47 +181,13 @@ class OdailyFetcher:
             Dict: 币种价格字典
         """
         try:
-            all_data = self.get_crypto_market_data()
+            index = self.get_market_index()
 
-            if not all_data:
+            if not index:
                 print("[ERROR] Odaily: 未能获取到市场数据")
                 return {}
 
-            prices = {}
-
-            for coin in coins:
-                # 查找匹配的交易对（例如 BTC/USDT 匹配 BTC）
-                for data in all_data:
-                    trading_pair = data.get('trading_pair', '')
-
-                    # 尝试多种匹配方式
-                    if (trading_pair.upper().startswith(coin.upper() + '/') or
-                        trading_pair.upper().startswith(coin.upper() + 'USDT') or
-                        trading_pair.upper() == coin.upper()):
-
-                        # 解析价格
-                        price_str = data.get('latest_price', '').replace('$', '').replace(',', '')
-                        try:
-                            price = float(price_str)
-                        except:
-                            continue
-
-                        # 解析涨跌幅
-                        change_str = data.get('change_24h', '').replace('%', '').replace('+', '')
-                        try:
-                            change_24h = float(change_str)
-                        except:
-                            change_24h = 0.0
-
-                        prices[coin] = {
-                            'price': price,
-                            'change_24h': change_24h,
-                            'high_24h': data.get('high_price', ''),
-                            'low_24h': data.get('low_price', ''),
-                            'volume_24h': data.get('volume_24h', ''),
-                            'market_cap': data.get('market_cap', '')
-                        }
-                        break
+            prices = prices_from_index(index, coins)
 
             if len(prices) > 0:
                 print(f"[INFO] Odaily成功获取 {len(prices)} 个币种价格")
@@ -162,6 +199,70 @@ class OdailyFetcher:
             return {}
 
 
+def parse_market_data(html: str) -> List[Dict[str, str]]:
+    """行情表 HTML -> 行数据字典列表 (跳过无交易对或价格的行)"""
+    crypto_data = []
+    for cells in parse_market_rows(html):
+        if len(cells) >= 8:  # 确保有足够的列
+            row_data = dict(zip(MARKET_COLUMNS, cells))
+
+            # 只添加有效数据的行
+            if row_data.get('trading_pair') and row_data.get('latest_price'):
+                crypto_data.append(row_data)
+    return crypto_data
+
+
+def _parse_price(row_data: Dict[str, str]):
+    """'$1,234.5' -> 1234.5；无法解析时返回 None"""
+    try:
+        return float(row_data.get('latest_price', '').replace('$', '').replace(',', ''))
+    except ValueError:
+        return None
+
+
+def build_market_index(crypto_data: List[Dict[str, str]]) -> Dict[str, Dict[str, str]]:
+    """按基础币种建立索引，同一币种有多个交易对时保留表格中第一个价格可解析的"""
+    index = {}
+    for row_data in crypto_data:
+        symbol = base_symbol(row_data['trading_pair'])
+        if symbol and symbol not in index and _parse_price(row_data) is not None:
+            index[symbol] = row_data
+    return index
+
+
+def prices_from_index(index: Dict[str, Dict[str, str]], coins: List[str]) -> Dict[str, Dict]:
+    """从市场索引中提取指定币种的统一价格格式"""
+    prices = {}
+
+    for coin in coins:
+        data = index.get(coin.upper())
+        if not data:
+            continue
+
+        # 解析价格
+        price = _parse_price(data)
+        if price is None:
+            continue
+
+        # 解析涨跌幅
+        change_str = data.get('change_24h', '').replace('%', '').replace('+', '')
+        try:
+            change_24h = float(change_str)
+        except ValueError:
+            change_24h = 0.0
+
+        prices[coin] = {
+            'price': price,
+            'change_24h': change_24h,
+            'high_24h': data.get('high_price', ''),
+            'low_24h': data.get('low_price', ''),
+            'volume_24h': data.get('volume_24h', ''),
+            'market_cap': data.get('market_cap', '')
+        }
+
+    return prices
+
+
 def main():
     """测试函数"""
     print("🔍 测试Odaily数据获取器...")
@@ -0,0 +1,301 @@
+"""
+Request scheduler module - Per-host token buckets, priority queueing and request coalescing
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+# 数值越小越先发送: 价格 > 行情详情 > 历史数据
+PRIORITY_PRICE = 0
+PRIORITY_MARKET = 1
+PRIORITY_HISTORY = 2
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` tokens per second, at most `capacity` stored
+
+    reserve() never blocks; it hands out the next token and returns how long
+    the caller must wait before using it.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token, possibly going into debt; returns seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def try_acquire(self) -> float:
+        """Take a token if one is available now; otherwise take nothing and return seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0)
+            if wait <= 0:
+                self.tokens -= 1
+                return 0.0
+            return wait
+
+    def penalize(self, seconds: float):
+        """Server said slow down (429): drain the bucket and hold it for `seconds`"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class _Request:
+    __slots__ = ('key', 'url', 'params', 'timeout', 'waiters', 'attempts')
+
+    def __init__(self, key, url, params, timeout):
+        self.key = key
+        self.url = url
+        self.params = params
+        self.timeout = timeout
+        self.waiters = []  # [(Future, 排队截止时间 或 None)]，合并的调用方各自一个
+        self.attempts = 0
+
+
+class _HostQueue:
+    """Priority queue plus dispatcher thread for one rate-limited host"""
+
+    def __init__(self, host: str, bucket: TokenBucket):
+        self.host = host
+        self.bucket = bucket
+        self.heap = []
+        self.cond = threading.Condition()
+        self.thread = None
+
+
+class RequestScheduler:
+    """
+    Central GET scheduler for rate-limited APIs
+
+    Each configured host gets a token bucket and a priority queue drained by
+    one dispatcher thread; the dispatcher waits for a token, then hands the
+    request to a shared worker pool, so the host is used at its allowed rate
+    without bursts that trigger 429. Identical requests (same URL and params)
+    already queued or in flight are sent once; every caller gets its own
+    Future and its own max_wait, and a request whose callers have all given
+    up is dropped from the queue unsent. A 429 drains the host's bucket for
+    the Retry-After period and requeues the request.
+    Hosts without a configured limit are sent immediately.
+    """
+
+    def __init__(self, session, limits: Dict[str, Tuple[float, float]] = None,
+                 max_workers: int = 4, max_retries_429: int = 2, default_retry_after: float = 30.0):
+        """
+        Args:
+            session: requests.Session used for all requests
+            limits: host -> (每秒请求数, 突发容量)，例如 {'api.coingecko.com': (0.5, 5)}
+            max_workers: 同时执行请求的线程数
+            max_retries_429: 收到 429 后重新排队的次数
+            default_retry_after: 429 响应未带 Retry-After 时的等待秒数
+        """
+        self.session = session
+        self.max_retries_429 = max_retries_429
+        self.default_retry_after = default_retry_after
+        self._hosts = {host: _HostQueue(host, TokenBucket(rate, burst))
+                       for host, (rate, burst) in (limits or {}).items()}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='http-sched')
+        self._closed = False
+
+        self.stats = {'sent': 0, 'coalesced': 0, 'rate_limited': 0, 'expired': 0}
+
+    def get(self, url: str, params: Dict = None, timeout: float = 10,
+            priority: int = PRIORITY_MARKET, max_wait: float = None):
+        """
+        Scheduled GET; blocks until the response arrives
+
+        Args:
+            priority: PRIORITY_PRICE / PRIORITY_MARKET / PRIORITY_HISTORY
+            max_wait: 排队超过该秒数仍未发送则放弃 (抛出 TimeoutError)
+
+        Returns:
+            requests.Response (the caller checks the status as before)
+        """
+        return self.submit(url, params, timeout, priority, max_wait).result()
+
+    def submit(self, url: str, params: Dict = None, timeout: float = 10,
+               priority: int = PRIORITY_MARKET, max_wait: float = None) -> Future:
+        key = (url, tuple(sorted((params or {}).items())))
+        host_queue = self._hosts.get(urlsplit(url).hostname)
+        future = Future()
+        deadline = time.monotonic() + max_wait if max_wait is not None else None
+
+        with self._lock:
+            request = self._inflight.get(key)
+            if request is not None:
+                self.stats['coalesced'] += 1
+                request.waiters.append((future, deadline))
+                return future
+
+            request = _Request(key, url, params, timeout)
+            request.waiters.append((future, deadline))
+            self._inflight[key] = request
+
+        if host_queue is None:
+            self._workers.submit(self._execute, request, None)
+        else:
+            self._enqueue(host_queue, priority, request)
+        return future
+
+    def _enqueue(self, host_queue: _HostQueue, priority: int, request: _Request):
+        with host_queue.cond:
+            heapq.heappush(host_queue.heap, (priority, next(self._seq), request))
+            if host_queue.thread is None:
+                host_queue.thread = threading.Thread(
+                    target=self._dispatch, args=(host_queue,),
+                    name=f'http-sched-{host_queue.host}', daemon=True
+                )
+                host_queue.thread.start()
+            host_queue.cond.notify()
+
+    def _dispatch(self, host_queue: _HostQueue):
+        while True:
+            with host_queue.cond:
+                while not host_queue.heap and not self._closed:
+                    host_queue.cond.wait()
+                if self._closed:
+                    return
+                expired, next_deadline = self._expire_waiters(host_queue)
+                request = None
+                if host_queue.heap and not expired:  # 有过期的先通知调用方，再回来等令牌
+                    # 先确认有令牌再出队: 等待期间请求留在队列中，新到的更高优先级请求可以排到前面
+                    delay = host_queue.bucket.try_acquire()
+                    if delay > 0:
+                        if next_deadline is not None:
+                            delay = min(delay, max(0.0, next_deadline - time.monotonic()))
+                        host_queue.cond.wait(delay)
+                    else:
+                        priority, _, request = heapq.heappop(host_queue.heap)
+
+            for future in expired:
+                self._set_future(future, error=TimeoutError(f"request to {host_queue.host} waited too long in queue"))
+            if request is not None:
+                self._workers.submit(self._execute, request, (host_queue, priority))
+
+    def _expire_waiters(self, host_queue: _HostQueue):
+        """
+        Drop callers whose max_wait has passed, anywhere in the queue (cond held)
+
+        Requests left without callers are removed unsent.
+
+        Returns:
+            (expired futures, earliest remaining deadline or None)
+        """
+        now = time.monotonic()
+        expired = []
+        next_deadline = None
+        removed = False
+        with self._lock:
+            for entry in host_queue.heap:
+                request = entry[2]
+                waiting = []
+                for future, deadline in request.waiters:
+                    if deadline is not None and now > deadline:
+                        expired.append(future)
+                    else:
+                        waiting.append((future, deadline))
+                        if deadline is not None and (next_deadline is None or deadline < next_deadline):
+                            next_deadline = deadline
+                if len(waiting) != len(request.waiters):
+                    request.waiters = waiting
+                    if not waiting:
+                        self._inflight.pop(request.key, None)
+                        removed = True
+            if removed:
+                host_queue.heap = [entry for entry in host_queue.heap if entry[2].waiters]
+                heapq.heapify(host_queue.heap)
+            self.stats['expired'] += len(expired)
+        return expired, next_deadline
+
+    def _execute(self, request: _Request, requeue):
+        try:
+            response = self.session.get(request.url, params=request.params, timeout=request.timeout)
+        except Exception as e:
+            self._finish(request, error=e)
+            return
+        self._count('sent')
+
+        if response.status_code == 429 and requeue is not None:
+            host_queue, priority = requeue
+            retry_after = self._retry_after(response)
+            host_queue.bucket.penalize(retry_after)
+            self._count('rate_limited')
+            if request.attempts < self.max_retries_429:
+                request.attempts += 1
+                print(f"[WARN] {host_queue.host} rate limited, retrying in {retry_after:.1f}s")
+                self._enqueue(host_queue, priority, request)
+                return
+
+        self._finish(request, response=response)
+
+    def _retry_after(self, response) -> float:
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return self.default_retry_after
+
+    def _finish(self, request: _Request, response=None, error: Exception = None):
+        with self._lock:
+            if self._inflight.get(request.key) is request:
+                del self._inflight[request.key]
+            waiters = request.waiters
+            request.waiters = []
+        for future, _ in waiters:
+            self._set_future(future, response, error)
+
+    @staticmethod
+    def _set_future(future: Future, response=None, error: Exception = None):
+        if future.done():
+            return  # 调用方已取消
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(response)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def queue_depth(self) -> Dict[str, int]:
+        return {host: len(q.heap) for host, q in self._hosts.items()}
+
+    def close(self):
+        self._closed = True
+        for host_queue in self._hosts.values():
+            with host_queue.cond:
+                pending = [request for _, _, request in host_queue.heap]
+                host_queue.heap.clear()
+                host_queue.cond.notify_all()
+            for request in pending:
+                self._finish(request, error=RuntimeError("request scheduler closed"))
+        self._workers.shutdown(wait=False)
@@ -0,0 +1,189 @@
+"""
+Source health module - Rolling health stats and circuit breakers for market data sources
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, List
+
+
+class SourceHealth:
+    """Rolling success rate, latency percentiles and circuit breaker for one source"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, window: int = 50, failure_threshold: int = 3,
+                 cooldown: float = 60, max_cooldown: float = 900):
+        """
+        Args:
+            window: 统计最近多少次请求
+            failure_threshold: 连续失败多少次后熔断
+            cooldown: 熔断后首次半开探测前的等待秒数，探测失败时翻倍
+            max_cooldown: 熔断等待上限 (秒)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._results = deque(maxlen=window)  # (success, latency)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.last_error_time = None
+        self.last_success_time = None
+
+    # ---- 熔断器 ----
+
+    def available(self, now: float = None) -> bool:
+        """Whether a request may be sent now (does not change state)"""
+        now = now or time.time()
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return now >= self.open_until
+        return not self.probe_in_flight
+
+    def begin_request(self, now: float = None) -> bool:
+        """Claim a request slot; an expired open circuit turns half-open for one probe"""
+        now = now or time.time()
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and now >= self.open_until:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record(self, success: bool, latency: float, now: float = None):
+        now = now or time.time()
+        self._results.append((success, latency))
+        self.probe_in_flight = False
+
+        if success:
+            self.last_success_time = now
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            self.cooldown = self.base_cooldown
+            return
+
+        self.last_error_time = now
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN:
+            # 半开探测失败: 重新熔断并延长等待时间
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open(now)
+        elif self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(now)
+
+    def _open(self, now: float):
+        self.state = self.OPEN
+        self.open_until = now + self.cooldown
+        print(f"[WARN] Data source {self.name} circuit opened for {self.cooldown:.0f}s")
+
+    # ---- 统计 ----
+
+    @property
+    def samples(self) -> int:
+        return len(self._results)
+
+    @property
+    def success_rate(self) -> float:
+        if not self._results:
+            return 1.0
+        return sum(1 for ok, _ in self._results if ok) / len(self._results)
+
+    def latency_percentile(self, pct: float) -> float:
+        latencies = sorted(latency for _, latency in self._results)
+        if not latencies:
+            return 0.0
+        index = min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def to_dict(self) -> Dict:
+        return {
+            'source': self.name,
+            'state': self.state,
+            'samples': self.samples,
+            'success_rate': round(self.success_rate, 3),
+            'latency_p50': round(self.latency_percentile(50), 3),
+            'latency_p95': round(self.latency_percentile(95), 3),
+            'consecutive_failures': self.consecutive_failures,
+            'open_until': self.open_until if self.state == self.OPEN else None,
+            'last_success_time': self.last_success_time,
+            'last_error_time': self.last_error_time
+        }
+
+
+class SourceHealthTracker:
+    """Health for every source plus the adaptive effective priority order"""
+
+    def __init__(self, min_samples: int = 5, degraded_success_rate: float = 0.8,
+                 slow_latency: float = 5.0, **health_options):
+        """
+        Args:
+            min_samples: 样本数达到该值后才根据统计降级
+            degraded_success_rate: 成功率低于该值的数据源排到健康数据源之后
+            slow_latency: p50 延迟超过该秒数的数据源同样降级
+        """
+        self.min_samples = min_samples
+        self.degraded_success_rate = degraded_success_rate
+        self.slow_latency = slow_latency
+        self._health_options = health_options
+        self._sources = {}
+        self._lock = threading.Lock()
+
+    def get(self, source: str) -> SourceHealth:
+        with self._lock:
+            health = self._sources.get(source)
+            if health is None:
+                health = self._sources[source] = SourceHealth(source, **self._health_options)
+            return health
+
+    def begin_request(self, source: str) -> bool:
+        health = self.get(source)
+        with self._lock:
+            return health.begin_request()
+
+    def record(self, source: str, success: bool, latency: float):
+        health = self.get(source)
+        with self._lock:
+            health.record(success, latency)
+
+    def _is_degraded(self, health: SourceHealth) -> bool:
+        if health.samples < self.min_samples:
+            return False
+        return (health.success_rate < self.degraded_success_rate or
+                health.latency_percentile(50) > self.slow_latency)
+
+    def order(self, priority: List[str]) -> List[str]:
+        """
+        Effective source order
+
+        Available sources keep their configured order, with degraded ones
+        (low success rate or slow p50) moved behind healthy ones. Sources with an open circuit are left out,
+        so the result is empty when every circuit is open.
+        """
+        healths = [(index, source, self.get(source)) for index, source in enumerate(priority)]
+        with self._lock:
+            now = time.time()
+            available = [
+                (self._is_degraded(health), index, source)
+                for index, source, health in healths
+                if health.available(now)
+            ]
+        return [source for _, _, source in sorted(available)]
+
+    def stats(self, priority: List[str]) -> Dict:
+        with self._lock:
+            sources = [self._sources[s].to_dict() for s in priority if s in self._sources]
+        return {
+            'configured_order': list(priority),
+            'effective_order': self.order(priority),
+            'sources': sources
+        }
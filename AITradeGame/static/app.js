@@ -3,6 +3,9 @@ class TradingApp {
         this.currentModelId = null;
         this.isAggregatedView = false;
         this.chart = null;
+        this.coinChart = null;
+        this.currentCoin = null; // Coin shown in the sidebar candle chart
+        this.currentInterval = '5m';
         this.refreshIntervals = {
             market: null,
             portfolio: null,
@@ -126,9 +129,20 @@ class TradingApp {
         document.getElementById('percentToggle').addEventListener('click', () => this.switchDisplayMode('percent'));
 
         // Time Range Toggle
-        document.querySelectorAll('.time-btn').forEach(btn => {
+        document.querySelectorAll('.time-btn:not(.interval-btn)').forEach(btn => {
             btn.addEventListener('click', (e) => this.switchTimeRange(e.target.dataset.range));
         });
+
+        // Coin Chart Interval Toggle
+        document.querySelectorAll('.interval-btn').forEach(btn => {
+            btn.addEventListener('click', (e) => this.switchCoinInterval(e.target.dataset.interval));
+        });
+
+        // Market price click opens the coin's local candle chart
+        document.getElementById('marketPrices').addEventListener('click', (e) => {
+            const item = e.target.closest('.price-item');
+            if (item) this.showCoinChart(item.dataset.coin);
+        });
     }
 
     async loadModels() {
@@ -316,7 +330,7 @@ class TradingApp {
         this.currentTimeRange = range;
 
         // Update button states
-        document.querySelectorAll('.time-btn').forEach(btn => {
+        document.querySelectorAll('.time-btn:not(.interval-btn)').forEach(btn => {
             btn.classList.toggle('active', btn.dataset.range === range);
         });
 
@@ -729,7 +743,7 @@ class TradingApp {
             const changeIcon = data.change_24h >= 0 ? '▲' : '▼';
 
             return `
-                <div class="price-item">
+                <div class="price-item" data-coin="${coin}">
                     <div>
                         <div class="price-symbol">${coin}</div>
                         <div class="price-change ${changeClass}">${changeIcon} ${Math.abs(data.change_24h).toFixed(2)}%</div>
@@ -746,6 +760,97 @@ class TradingApp {
             const timeStr = now.toLocaleTimeString('zh-CN', { hour: '2-digit', minute: '2-digit', second: '2-digit' });
             updateTimeElement.textContent = `最后更新: ${timeStr}`;
         }
+
+        if (this.currentCoin) {
+            this.loadCoinChart();
+        }
+    }
+
+    showCoinChart(coin) {
+        this.currentCoin = coin;
+        document.getElementById('coinChartPanel').style.display = 'block';
+        this.loadCoinChart();
+    }
+
+    switchCoinInterval(interval) {
+        this.currentInterval = interval;
+        document.querySelectorAll('.interval-btn').forEach(btn => {
+            btn.classList.toggle('active', btn.dataset.interval === interval);
+        });
+        if (this.currentCoin) {
+            this.loadCoinChart();
+        }
+    }
+
+    async loadCoinChart() {
+        // Local candles rolled up from recorded ticks (1h also includes the synced history)
+        try {
+            const response = await fetch(`/api/market/history/${this.currentCoin}?interval=${this.currentInterval}&limit=120`);
+            const candles = await response.json();
+            this.renderCoinChart(Array.isArray(candles) ? candles : []);
+        } catch (error) {
+            console.error('Failed to load coin history:', error);
+        }
+    }
+
+    renderCoinChart(candles) {
+        document.getElementById('coinChartTitle').textContent = this.currentCoin;
+        const chartDom = document.getElementById('coinChart');
+        if (!this.coinChart) {
+            this.coinChart = echarts.init(chartDom);
+            window.addEventListener('resize', () => {
+                if (this.coinChart) {
+                    this.coinChart.resize();
+                }
+            });
+        }
+
+        if (candles.length === 0) {
+            this.coinChart.clear();
+            this.coinChart.setOption({
+                title: {
+                    text: '暂无本地行情数据',
+                    left: 'center',
+                    top: 'center',
+                    textStyle: { color: '#86909c', fontSize: 12 }
+                }
+            });
+            return;
+        }
+
+        const times = candles.map(c => new Date(c.open_time).toLocaleString('zh-CN', {
+            month: '2-digit', day: '2-digit', hour: '2-digit', minute: '2-digit'
+        }));
+        // ECharts candlestick order: open, close, low, high
+        const values = candles.map(c => [c.open, c.close, c.low, c.high]);
+
+        this.coinChart.setOption({
+            title: { show: false },
+            grid: { left: '12%', right: '4%', bottom: '12%', top: '6%' },
+            xAxis: {
+                type: 'category',
+                data: times,
+                axisLabel: { color: '#86909c', fontSize: 10 },
+                axisLine: { lineStyle: { color: '#e5e6eb' } }
+            },
+            yAxis: {
+                type: 'value',
+                scale: true,
+                axisLabel: { color: '#86909c', fontSize: 10 },
+                splitLine: { lineStyle: { color: '#f2f3f5' } }
+            },
+            tooltip: { trigger: 'axis' },
+            series: [{
+                type: 'candlestick',
+                data: values,
+                itemStyle: {
+                    color: '#f53f3f',
+                    color0: '#00b42a',
+                    borderColor: '#f53f3f',
+                    borderColor0: '#00b42a'
+                }
+            }]
+        }, true);
     }
 
     switchTab(tabName) {
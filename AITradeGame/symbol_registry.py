@@ -0,0 +1,123 @@
+"""
+Symbol registry module - Tradable coin universe with per-source symbol mappings
+"""
+import sqlite3
+import threading
+from typing import Dict, List
+
+# (symbol, binance_symbol, coingecko_id)
+DEFAULT_SYMBOLS = [
+    ('BTC', 'BTCUSDT', 'bitcoin'),
+    ('ETH', 'ETHUSDT', 'ethereum'),
+    ('SOL', 'SOLUSDT', 'solana'),
+    ('BNB', 'BNBUSDT', 'binancecoin'),
+    ('XRP', 'XRPUSDT', 'ripple'),
+    ('DOGE', 'DOGEUSDT', 'dogecoin'),
+]
+
+
+class _Universe:
+    """Immutable view of the enabled symbols, swapped as a whole on reload"""
+
+    def __init__(self, rows: List[Dict]):
+        self.coins = tuple(row['symbol'] for row in rows)
+        self.coin_set = frozenset(self.coins)
+        self.binance_symbols = {row['symbol']: row['binance_symbol'] for row in rows if row.get('binance_symbol')}
+        self.coingecko_mapping = {row['symbol']: row['coingecko_id'] for row in rows if row.get('coingecko_id')}
+
+
+class SymbolRegistry:
+    """
+    Enabled coins and their Binance / CoinGecko identifiers
+
+    Backed by the `symbols` table. Reads are served from an in-memory
+    universe that is replaced atomically after every change, so the trading
+    loop, Flask handlers and fetchers all see one consistent list without
+    touching the database on the hot path. Without a database (or before
+    init_db) the default six coins are used.
+    """
+
+    def __init__(self, db=None):
+        self.db = db
+        self._universe = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def _load(self) -> _Universe:
+        rows = None
+        if self.db is not None:
+            try:
+                rows = self.db.get_symbols(enabled_only=True)
+            except sqlite3.OperationalError:
+                rows = None  # symbols 表尚未创建
+        if rows is None:
+            rows = [{'symbol': s, 'binance_symbol': b, 'coingecko_id': c} for s, b, c in DEFAULT_SYMBOLS]
+        return _Universe(rows)
+
+    def _current(self) -> _Universe:
+        universe = self._universe
+        if universe is None:
+            with self._lock:
+                if self._universe is None:
+                    self._universe = self._load()
+                universe = self._universe
+        return universe
+
+    def reload(self):
+        """Re-read the symbols table (call after editing it directly) and notify listeners"""
+        universe = self._load()
+        with self._lock:
+            self._universe = universe
+        for callback in list(self._listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"[WARN] Symbol registry listener failed: {e}")
+
+    def add_listener(self, callback):
+        """Call callback() after every reload, e.g. to resubscribe a stream to the new universe"""
+        self._listeners.append(callback)
+
+    def coins(self) -> List[str]:
+        return list(self._current().coins)
+
+    @property
+    def binance_symbols(self) -> Dict[str, str]:
+        return self._current().binance_symbols
+
+    @property
+    def coingecko_mapping(self) -> Dict[str, str]:
+        return self._current().coingecko_mapping
+
+    def __contains__(self, coin: str) -> bool:
+        return coin in self._current().coin_set
+
+    def __len__(self) -> int:
+        return len(self._current().coins)
+
+    # ---- 修改 (写入数据库后整体替换内存视图) ----
+
+    def add(self, symbol: str, binance_symbol: str = None, coingecko_id: str = None, enabled: bool = True):
+        """
+        Add or update a coin
+
+        binance_symbol defaults to <SYMBOL>USDT; coingecko_id defaults to the
+        lower-cased symbol, which CoinGecko only accepts for some coins, so
+        pass the real id for anything outside the majors.
+        """
+        symbol = symbol.upper()
+        self.db.upsert_symbol(
+            symbol,
+            binance_symbol=binance_symbol if binance_symbol is not None else f"{symbol}USDT",
+            coingecko_id=coingecko_id or symbol.lower(),
+            enabled=enabled
+        )
+        self.reload()
+
+    def set_enabled(self, symbol: str, enabled: bool):
+        self.db.set_symbol_enabled(symbol.upper(), enabled)
+        self.reload()
+
+    def remove(self, symbol: str):
+        self.db.delete_symbol(symbol.upper())
+        self.reload()
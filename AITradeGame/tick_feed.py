@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tick feed module - Streaming WebSocket ticker ingestion with an in-memory tick book
+"""
+import json
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+try:
+    import websocket  # websocket-client
+    HAS_WEBSOCKET = True
+except ImportError:
+    HAS_WEBSOCKET = False
+
+BINANCE_STREAM_URL = 'wss://stream.binance.com:9443/stream'
+
+Tick = namedtuple('Tick', ['price', 'change_24h', 'timestamp', 'received_at'])
+
+
+class TickBook:
+    """
+    Latest tick per coin
+
+    Writers replace a coin's entry with a new immutable Tick; a single dict
+    assignment is atomic under the GIL, so readers never take a lock.
+    """
+
+    def __init__(self):
+        self._ticks = {}
+
+    def update(self, coin: str, price: float, change_24h: float, timestamp: int):
+        self._ticks[coin] = Tick(price, change_24h, timestamp, time.time())
+
+    def get(self, coin: str) -> Optional[Tick]:
+        return self._ticks.get(coin)
+
+    def get_prices(self, coins: List[str], max_age: float) -> Dict[str, Dict]:
+        """Prices for coins whose latest tick is younger than max_age seconds"""
+        now = time.time()
+        prices = {}
+        for coin in coins:
+            tick = self._ticks.get(coin)
+            if tick is not None and now - tick.received_at < max_age:
+                prices[coin] = {'price': tick.price, 'change_24h': tick.change_24h}
+        return prices
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+
+class BinanceTickFeed(threading.Thread):
+    """
+    Binance miniTicker WebSocket client with a reconnecting loop
+
+    Accepts combined-stream messages ({"stream": ..., "data": {...}}), single
+    miniTicker payloads and !miniTicker@arr arrays, so it also works against
+    tick_replay_server.py.
+    """
+
+    def __init__(self, symbols: Dict[str, str], tick_book: TickBook = None, url: str = None,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 60.0, timeout: float = 30.0,
+                 on_tick=None):
+        """
+        Args:
+            symbols: 币种到 Binance 交易对的映射，例如 {'BTC': 'BTCUSDT'}
+            tick_book: 写入的行情簿，为空时自建
+            url: WebSocket 地址，默认按 symbols 订阅 Binance combined stream (set_symbols 时重建)
+            reconnect_delay: 首次重连等待秒数，连续失败时翻倍
+            max_reconnect_delay: 重连等待上限 (秒)
+            timeout: 接收超时 (秒)，超时视为连接失效并重连
+            on_tick: 可选回调 on_tick(coin, price, timestamp_ms)，每条报价写入行情簿后调用
+        """
+        super().__init__(name='tick-feed', daemon=True)
+        self.symbols = dict(symbols)
+        self._coin_by_symbol = {symbol.upper(): coin for coin, symbol in self.symbols.items()}
+        self.tick_book = tick_book if tick_book is not None else TickBook()  # 空 TickBook 的 len 为 0
+        self._custom_url = url is not None
+        self.url = url or self._build_url()
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.timeout = timeout
+        self.on_tick = on_tick
+
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+        self._stop_event = threading.Event()
+        self._ws = None
+
+    def _build_url(self) -> str:
+        streams = '/'.join(f"{symbol.lower()}@miniTicker" for symbol in self.symbols.values())
+        return f"{BINANCE_STREAM_URL}?streams={streams}"
+
+    def set_symbols(self, symbols: Dict[str, str]) -> bool:
+        """
+        Switch to a new coin -> Binance symbol mapping
+
+        With the default Binance URL the stream address is rebuilt and the
+        running connection is closed, so run() reconnects at once (no backoff)
+        subscribed to the new list. A custom URL (e.g. the replay server) is
+        kept; only the symbol mapping changes.
+
+        Returns:
+            True if the mapping changed
+        """
+        symbols = dict(symbols)
+        if symbols == self.symbols:
+            return False
+        self.symbols = symbols
+        self._coin_by_symbol = {symbol.upper(): coin for coin, symbol in symbols.items()}
+        if not self._custom_url:
+            self.url = self._build_url()
+            ws = self._ws
+            if ws is not None:
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+        return True
+
+    def start(self):
+        if not HAS_WEBSOCKET:
+            raise RuntimeError("websocket-client is required for the tick feed (pip install websocket-client)")
+        super().start()
+
+    def stop(self):
+        self._stop_event.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def run(self):
+        delay = self.reconnect_delay
+        while not self._stop_event.is_set():
+            url = self.url
+            try:
+                self._ws = websocket.create_connection(url, timeout=self.timeout)
+                self.connected = True
+                delay = self.reconnect_delay
+                print(f"[INFO] Tick feed connected: {url}")
+
+                # 订阅地址变化 (set_symbols) 时退出并用新地址重连
+                while not self._stop_event.is_set() and self.url == url:
+                    message = self._ws.recv()
+                    if not message:
+                        raise ConnectionError("connection closed by server")
+                    self.handle_message(message)
+
+            except Exception as e:
+                if self._stop_event.is_set():
+                    break
+                if self.url == url:
+                    self.reconnects += 1
+                    print(f"[WARN] Tick feed disconnected: {e}, reconnecting in {delay:.0f}s")
+            finally:
+                self.connected = False
+                if self._ws is not None:
+                    try:
+                        self._ws.close()
+                    except Exception:
+                        pass
+                    self._ws = None
+
+            if self.url != url and not self._stop_event.is_set():
+                print(f"[INFO] Tick feed resubscribing to {len(self.symbols)} symbols")
+                continue
+            self._stop_event.wait(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+        print("[INFO] Tick feed stopped")
+
+    def handle_message(self, message: str):
+        payload = json.loads(message)
+        if isinstance(payload, dict) and 'data' in payload:
+            payload = payload['data']
+
+        for item in payload if isinstance(payload, list) else [payload]:
+            coin = self._coin_by_symbol.get(str(item.get('s', '')).upper())
+            if not coin:
+                continue
+            close = float(item['c'])
+            open_price = float(item.get('o') or 0)
+            change_24h = (close - open_price) / open_price * 100 if open_price > 0 else 0.0
+            timestamp = int(item.get('E', time.time() * 1000))
+            self.tick_book.update(coin, close, round(change_24h, 2), timestamp)
+            self.messages += 1
+            if self.on_tick is not None:
+                self.on_tick(coin, close, timestamp)
+
+
+def main():
+    """测试函数: python tick_feed.py [ws://localhost:8765]"""
+    import sys
+
+    symbols = {'BTC': 'BTCUSDT', 'ETH': 'ETHUSDT', 'SOL': 'SOLUSDT',
+               'BNB': 'BNBUSDT', 'XRP': 'XRPUSDT', 'DOGE': 'DOGEUSDT'}
+    url = sys.argv[1] if len(sys.argv) > 1 else None
+
+    feed = BinanceTickFeed(symbols, url=url)
+    feed.start()
+    try:
+        for _ in range(10):
+            time.sleep(1)
+            prices = feed.tick_book.get_prices(list(symbols), max_age=10)
+            print(f"[{feed.messages} msgs] " + ', '.join(f"{c}: {d['price']}" for c, d in prices.items()))
+    finally:
+        feed.stop()
+
+
+if __name__ == "__main__":
+    main()
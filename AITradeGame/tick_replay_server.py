@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Local WebSocket stand-in that replays recorded ticks, for testing the tick feed offline
+
+Usage:
+    python tick_replay_server.py [--port 8765] [--file fixtures/binance_ticks.jsonl] [--speed 10]
+
+Each line of the recording is one Binance combined-stream message. Messages
+are replayed in a loop, paced by their "E" event times divided by --speed.
+Only the subset of RFC 6455 needed here is implemented: the opening
+handshake, unmasked server text frames, and client close/ping frames.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import os
+import socketserver
+import struct
+import threading
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'binance_ticks.jsonl')
+
+
+def load_recording(path: str) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def encode_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """Build one unmasked server frame"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack('!H', length)
+    else:
+        header += bytes([127]) + struct.pack('!Q', length)
+    return header + payload
+
+
+class ReplayHandler(socketserver.BaseRequestHandler):
+    """One client connection: handshake, then stream the recording"""
+
+    def handle(self):
+        if not self._handshake():
+            return
+
+        self.closed = threading.Event()
+        self.send_lock = threading.Lock()
+        threading.Thread(target=self._read_client, daemon=True).start()
+        print(f"[INFO] Replay client connected: {self.client_address[0]}:{self.client_address[1]}")
+
+        recording = self.server.recording
+        speed = self.server.speed
+        try:
+            while not self.closed.is_set():
+                previous_time = None
+                for message in recording:
+                    event_time = json.loads(message).get('data', {}).get('E')
+                    if previous_time is not None and event_time is not None:
+                        self.closed.wait(max(0.0, (event_time - previous_time) / 1000 / speed))
+                    previous_time = event_time
+                    if self.closed.is_set():
+                        break
+                    self._send(encode_frame(message.encode('utf-8')))
+        except OSError:
+            pass
+        print(f"[INFO] Replay client disconnected: {self.client_address[0]}:{self.client_address[1]}")
+
+    def _handshake(self) -> bool:
+        data = b''
+        while b'\r\n\r\n' not in data:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                return False
+            data += chunk
+
+        headers = {}
+        for line in data.decode('latin-1').split('\r\n')[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        key = headers.get('sec-websocket-key')
+        if not key:
+            self.request.sendall(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return False
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.request.sendall((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+        ).encode())
+        return True
+
+    def _send(self, frame: bytes):
+        with self.send_lock:
+            self.request.sendall(frame)
+
+    def _recv_exact(self, n: int) -> bytes:
+        data = b''
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError('client went away')
+            data += chunk
+        return data
+
+    def _read_client(self):
+        """Answer pings and stop on close; other client frames are ignored"""
+        try:
+            while True:
+                first, second = self._recv_exact(2)
+                opcode = first & 0x0F
+                length = second & 0x7F
+                if length == 126:
+                    length = struct.unpack('!H', self._recv_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack('!Q', self._recv_exact(8))[0]
+                mask = self._recv_exact(4) if second & 0x80 else b'\x00' * 4
+                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(length)))
+
+                if opcode == 0x8:
+                    self._send(encode_frame(payload[:2], opcode=0x8))
+                    break
+                if opcode == 0x9:
+                    self._send(encode_frame(payload, opcode=0xA))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.closed.set()
+
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, recording: list, speed: float = 1.0):
+        super().__init__(address, ReplayHandler)
+        self.recording = recording
+        self.speed = speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded ticks over WebSocket')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--file', default=DEFAULT_FILE)
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed multiplier')
+    args = parser.parse_args()
+
+    recording = load_recording(args.file)
+    server = ReplayServer((args.host, args.port), recording, speed=args.speed)
+    print(f"[INFO] Replaying {len(recording)} ticks on ws://{args.host}:{args.port} (x{args.speed})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Tick store module - Batched background writer for market ticks with candle rollups and retention
+"""
+import queue
+import threading
+import time
+from typing import Dict, List
+
+# 汇总周期: 名称 -> 毫秒
+# 小时线使用独立的 '1h_tick' 序列: CoinGecko 同步的 '1h' 序列以最新K线时间作为增量下载起点，
+# 汇总写入同一序列会把起点推到当前小时，导致历史或停机缺口永远不再下载
+ROLLUP_INTERVALS = {
+    '1m': 60 * 1000,
+    '5m': 5 * 60 * 1000,
+    '1h_tick': 3600 * 1000,
+}
+
+# 保留期 (秒)，None 表示永久保留
+DEFAULT_RETENTION = {
+    'ticks': 2 * 86400,
+    '1m': 7 * 86400,
+    '5m': 30 * 86400,
+    '1h_tick': None,
+}
+
+# 读取时用本地汇总补齐的同步序列: 同步序列 -> 同周期的汇总序列
+ROLLUP_FALLBACK = {
+    '1h': '1h_tick',
+}
+
+
+def rollup(ticks: List[tuple], interval_ms: int) -> Dict[str, List[tuple]]:
+    """
+    Aggregate (coin, timestamp, price) rows sorted by coin then time into bars
+
+    Returns:
+        {coin: [(open_time, open, high, low, close, volume), ...]}
+    """
+    bars = {}
+    current_coin = None
+    bar = None
+    for coin, timestamp, price in ticks:
+        open_time = timestamp - timestamp % interval_ms
+        if coin != current_coin or bar is None or bar[0] != open_time:
+            if bar is not None:
+                bars.setdefault(current_coin, []).append(tuple(bar))
+            current_coin = coin
+            bar = [open_time, price, price, price, price, 0]
+        else:
+            bar[2] = max(bar[2], price)
+            bar[3] = min(bar[3], price)
+            bar[4] = price
+    if bar is not None:
+        bars.setdefault(current_coin, []).append(tuple(bar))
+    return bars
+
+
+def fill_candle_gaps(synced: List[Dict], rolled: List[Dict]) -> List[Dict]:
+    """
+    Synced candles with local rollup candles filling the buckets the sync has not covered
+
+    Both lists are ascending by open_time and use the same interval; a
+    synced candle always wins over a rollup of the same bucket.
+    """
+    if not rolled:
+        return synced or []
+    if not synced:
+        return rolled
+    candles = {c['open_time']: c for c in rolled}
+    candles.update((c['open_time'], c) for c in synced)
+    return [candles[t] for t in sorted(candles)]
+
+
+class TickWriter(threading.Thread):
+    """
+    Background writer for market_ticks
+
+    record() only enqueues (a bounded queue; ticks are dropped while the
+    writer is not running or the queue is full); the writer thread drains
+    the queue and inserts with one executemany per batch. Every rollup_every seconds the ticks
+    since the last open bucket are aggregated into 1m/5m/1h_tick candles
+    (merged into the candles table, separate from the synced '1h' series), and retention is applied hourly.
+    """
+
+    def __init__(self, db, flush_interval: float = 5.0, batch_size: int = 1000,
+                 min_tick_interval: float = 5.0, rollup_every: float = 60.0,
+                 retention: Dict = None, intervals: Dict = None, max_queue: int = 50000):
+        """
+        Args:
+            db: Database
+            flush_interval: 最长缓冲秒数，到时即写入
+            batch_size: 缓冲达到该条数立即写入
+            min_tick_interval: 同一币种两次记录的最小间隔 (秒)，流式行情按此降频
+            rollup_every: 汇总K线的间隔 (秒)
+            retention: 保留期 {'ticks': 秒, '1m': 秒, ...}，None 表示永久
+            intervals: 汇总周期 {名称: 毫秒}
+            max_queue: 待写入报价的最大条数，写入跟不上时丢弃新报价
+        """
+        super().__init__(name='tick-writer', daemon=True)
+        self.db = db
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.min_tick_interval_ms = int(min_tick_interval * 1000)
+        self.rollup_every = rollup_every
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.intervals = intervals or ROLLUP_INTERVALS
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._last_recorded = {}
+        self._rolled_from = {}  # interval -> 下次汇总起点 (最后一个未完结K线的开始时间)
+        self._stop_event = threading.Event()
+        self._last_rollup = 0.0
+        self._last_retention = 0.0
+
+        self.written = 0
+        self.dropped = 0
+
+    # ---- 生产者 ----
+
+    def record(self, prices: Dict[str, Dict], timestamp: int = None, source: str = None):
+        """Queue the latest prices (mock data is ignored)"""
+        timestamp = timestamp or int(time.time() * 1000)
+        for coin, data in prices.items():
+            if data.get('is_mock') or not data.get('price'):
+                continue
+            self.record_tick(coin, data['price'], timestamp, source)
+
+    def record_tick(self, coin: str, price: float, timestamp: int, source: str = None):
+        if not self.is_alive() or self._stop_event.is_set():
+            return  # 写入线程未启动或已停止，不积压
+        last = self._last_recorded.get(coin)
+        if last is not None and timestamp - last < self.min_tick_interval_ms:
+            return
+        self._last_recorded[coin] = timestamp
+        try:
+            self._queue.put_nowait((coin, timestamp, price, source))
+        except queue.Full:
+            self.dropped += 1
+
+    # ---- 写入线程 ----
+
+    def run(self):
+        while not self._stop_event.is_set():
+            batch = self._drain(self.flush_interval)
+            self._write(batch)
+            self._maintain()
+        self._write(self._drain(0))
+        self._maintain(force=True)
+
+    def _drain(self, wait: float) -> List[tuple]:
+        batch = []
+        deadline = time.time() + wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.time()
+            try:
+                item = self._queue.get_nowait() if timeout <= 0 else self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:  # stop() 唤醒
+                break
+            batch.append(item)
+        return batch
+
+    def _write(self, batch: List[tuple]):
+        if not batch:
+            return
+        try:
+            self.db.insert_ticks(batch)
+            self.written += len(batch)
+        except Exception as e:
+            print(f"[ERROR] Tick writer failed to insert {len(batch)} ticks: {e}")
+
+    def _maintain(self, force: bool = False):
+        now = time.time()
+        try:
+            if force or now - self._last_rollup >= self.rollup_every:
+                self.rollup_now()
+                self._last_rollup = now
+            if force or now - self._last_retention >= 3600:
+                self.apply_retention()
+                self._last_retention = now
+        except Exception as e:
+            print(f"[ERROR] Tick writer maintenance failed: {e}")
+
+    def rollup_now(self):
+        """Aggregate ticks since each interval's last open bucket into candles"""
+        now_ms = int(time.time() * 1000)
+        default_start = now_ms - (self.retention['ticks'] or 86400) * 1000
+        starts = {name: self._rolled_from.get(name, default_start) for name in self.intervals}
+        since = min(starts.values())
+
+        ticks = self.db.get_ticks(since=since)
+        if not ticks:
+            return
+
+        # 仍在队列中的报价可能属于刚结束的K线，下次汇总起点向前留出写入延迟
+        settled_ms = now_ms - int(self.flush_interval * 1000) - 1000
+        for name, interval_ms in self.intervals.items():
+            start = starts[name]
+            rows = ticks if start == since else [t for t in ticks if t[1] >= start]
+            self.db.merge_candles(name, rollup(rows, interval_ms))
+            self._rolled_from[name] = settled_ms - settled_ms % interval_ms
+
+    def apply_retention(self):
+        now_ms = int(time.time() * 1000)
+        if self.retention.get('ticks'):
+            self.db.delete_ticks_before(now_ms - self.retention['ticks'] * 1000)
+        for name in self.intervals:
+            keep = self.retention.get(name)
+            if keep:
+                self.db.delete_candles_before(name, now_ms - keep * 1000)
+
+    def stop(self, timeout: float = 10):
+        """Flush queued ticks, run a final rollup and stop"""
+        self._stop_event.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # 队列满时写入线程不会阻塞在 get 上，下一轮即检查停止标志
+        if self.is_alive():
+            self.join(timeout)
@@ -1,29 +1,95 @@
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List
 import json
+import time
+from market_snapshot import is_tradable
 
 class TradingEngine:
-    def __init__(self, model_id: int, db, market_fetcher, ai_trader, trade_fee_rate: float = 0.001):
+    def __init__(self, model_id: int, db, market_fetcher, ai_trader, trade_fee_rate: float = 0.001,
+                 symbol_registry=None):
         self.model_id = model_id
         self.db = db
         self.market_fetcher = market_fetcher
         self.ai_trader = ai_trader
-        self.coins = ['BTC', 'ETH', 'SOL', 'BNB', 'XRP', 'DOGE']
+        # 交易币种来自注册表，修改后下一个周期立即生效
+        self.symbol_registry = symbol_registry if symbol_registry is not None else market_fetcher.symbol_registry
         self.trade_fee_rate = trade_fee_rate  # 从配置中传入费率
+
+    @property
+    def coins(self) -> List[str]:
+        return self.symbol_registry.coins()
     
-    def execute_trading_cycle(self) -> Dict:
+    def execute_trading_cycle(self, snapshot=None, deadline: float = None, cancel_event=None) -> Dict:
+        """
+        Run one decision cycle
+
+        Args:
+            snapshot: Shared MarketSnapshot for this cycle; fetched per engine if omitted
+            deadline: time.monotonic() 截止时间，剩余时间作为LLM请求超时
+            cancel_event: threading.Event，置位后丢弃尚未执行的决策；
+                流式模式下置位前已执行的交易保留，结果为 cancelled + partial
+
+        Returns:
+            success=True 仅表示完整周期；被取消时 success=False, cancelled=True
+        """
         try:
-            market_state = self._get_market_state()
+            if snapshot is not None:
+                market_state = snapshot.get_market_state(self.coins)
+            else:
+                market_state = self._get_market_state()
             
-            current_prices = {coin: market_state[coin]['price'] for coin in market_state}
+            # 快照中没有有效价格的币种按最近一次真实价格估值，不按 0 计算
+            current_prices = self.market_fetcher.get_valuation_prices(self.coins, prices=market_state)
             
             portfolio = self.db.get_portfolio(self.model_id, current_prices)
             
             account_info = self._build_account_info(portfolio)
             
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return {'success': False, 'error': 'deadline exceeded before decision'}
+
+            # 流式模式下每个币种的决策一到达就执行，不等待完整响应
+            executed = {}
+
+            def on_decision(coin, decision):
+                if coin in executed or (cancel_event is not None and cancel_event.is_set()):
+                    return
+                result = self._execute_decision(coin, decision, market_state, portfolio)
+                if result is not None:
+                    executed[coin] = result
+
             decisions = self.ai_trader.make_decision(
-                market_state, portfolio, account_info
+                market_state, portfolio, account_info, timeout=timeout, on_decision=on_decision
             )
+
+            cancelled = cancel_event is not None and cancel_event.is_set()
+            if cancelled and not executed:
+                print(f"[WARN] Model {self.model_id} cycle cancelled, discarding late decision")
+                return {'success': False, 'cancelled': True, 'error': 'cancelled'}
+            
+            if cancelled:
+                # 取消前已流式执行了部分交易: 记录对话并标明被中断，不记录账户价值，不算成功周期
+                execution_results = list(executed.values())
+                self.db.add_conversation(
+                    self.model_id,
+                    user_prompt=self._format_prompt(market_state, portfolio, account_info),
+                    ai_response=json.dumps(decisions, ensure_ascii=False),
+                    cot_trace=f"[CANCELLED] cycle cut short after executing {', '.join(executed)}; "
+                              f"remaining decisions discarded"
+                )
+                print(f"[WARN] Model {self.model_id} cycle cancelled after {len(executed)} executed decision(s)")
+                return {
+                    'success': False,
+                    'cancelled': True,
+                    'partial': True,
+                    'error': f'cancelled after {len(executed)} executed decision(s)',
+                    'decisions': decisions,
+                    'executions': execution_results,
+                    'usage': getattr(self.ai_trader, 'last_usage', {})
+                }
             
             self.db.add_conversation(
                 self.model_id,
@@ -32,7 +98,9 @@ class TradingEngine:
                 cot_trace=''
             )
             
-            execution_results = self._execute_decisions(decisions, market_state, portfolio)
+            execution_results = list(executed.values())
+            remaining = {coin: decision for coin, decision in decisions.items() if coin not in executed}
+            execution_results += self._execute_decisions(remaining, market_state, portfolio)
             
             updated_portfolio = self.db.get_portfolio(self.model_id, current_prices)
             self.db.record_account_value(
@@ -46,7 +114,8 @@ class TradingEngine:
                 'success': True,
                 'decisions': decisions,
                 'executions': execution_results,
-                'portfolio': updated_portfolio
+                'portfolio': updated_portfolio,
+                'usage': getattr(self.ai_trader, 'last_usage', {})
             }
             
         except Exception as e:
@@ -60,13 +129,14 @@ class TradingEngine:
     
     def _get_market_state(self) -> Dict:
         market_state = {}
-        prices = self.market_fetcher.get_current_prices(self.coins)
+        coins = self.coins
+        prices = self.market_fetcher.get_current_prices(coins, allow_stale=False)
+        tradable = [coin for coin in coins if coin in prices and is_tradable(prices[coin])]
+        indicators = self.market_fetcher.calculate_indicators_for_coins(tradable)
         
-        for coin in self.coins:
-            if coin in prices:
-                market_state[coin] = prices[coin].copy()
-                indicators = self.market_fetcher.calculate_technical_indicators(coin)
-                market_state[coin]['indicators'] = indicators
+        for coin in tradable:
+            market_state[coin] = prices[coin].copy()
+            market_state[coin]['indicators'] = indicators.get(coin, {})
         
         return market_state
     
@@ -91,30 +161,36 @@ class TradingEngine:
         results = []
         
         for coin, decision in decisions.items():
-            if coin not in self.coins:
-                continue
-            
-            signal = decision.get('signal', '').lower()
-            
-            try:
-                if signal == 'buy_to_enter':
-                    result = self._execute_buy(coin, decision, market_state, portfolio)
-                elif signal == 'sell_to_enter':
-                    result = self._execute_sell(coin, decision, market_state, portfolio)
-                elif signal == 'close_position':
-                    result = self._execute_close(coin, decision, market_state, portfolio)
-                elif signal == 'hold':
-                    result = {'coin': coin, 'signal': 'hold', 'message': 'Hold position'}
-                else:
-                    result = {'coin': coin, 'error': f'Unknown signal: {signal}'}
-                
+            result = self._execute_decision(coin, decision, market_state, portfolio)
+            if result is not None:
                 results.append(result)
-                
-            except Exception as e:
-                results.append({'coin': coin, 'error': str(e)})
         
         return results
     
+    def _execute_decision(self, coin: str, decision: Dict, market_state: Dict, portfolio: Dict):
+        """Execute one coin's decision; returns None for coins outside the universe"""
+        if coin not in self.symbol_registry:
+            return None
+        
+        signal = decision.get('signal', '').lower()
+        if signal != 'hold' and (coin not in market_state or not is_tradable(market_state[coin])):
+            # 价格为 0 时保证金也为 0，会以零成本开仓
+            return {'coin': coin, 'error': 'No valid price'}
+        
+        try:
+            if signal == 'buy_to_enter':
+                return self._execute_buy(coin, decision, market_state, portfolio)
+            elif signal == 'sell_to_enter':
+                return self._execute_sell(coin, decision, market_state, portfolio)
+            elif signal == 'close_position':
+                return self._execute_close(coin, decision, market_state, portfolio)
+            elif signal == 'hold':
+                return {'coin': coin, 'signal': 'hold', 'message': 'Hold position'}
+            else:
+                return {'coin': coin, 'error': f'Unknown signal: {signal}'}
+        except Exception as e:
+            return {'coin': coin, 'error': str(e)}
+    
     def _execute_buy(self, coin: str, decision: Dict, market_state: Dict, 
                     portfolio: Dict) -> Dict:
         quantity = float(decision.get('quantity', 0))